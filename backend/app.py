@@ -1,307 +1,256 @@
-from flask import Flask, request, jsonify
+from flask import Blueprint, Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
-import cohere
+import json
 import os
-from dotenv import load_dotenv
 import time
-
-# Load environment variables
+from dotenv import load_dotenv
+# Load environment variables before the modules below read their settings
 load_dotenv()
 
-app = Flask(__name__)
-CORS(app, resources={
-    r"/*": {
-        "origins": ["http://localhost:3000"],
-        "methods": ["POST", "OPTIONS"],
-        "allow_headers": ["Content-Type"]
-    }
-})
-
-# Initialize Cohere client
-api_key = os.getenv('COHERE_API_KEY')
-if not api_key:
-    raise ValueError("COHERE_API_KEY not found in environment variables. Please check your .env file.")
-
-try:
-    co = cohere.Client(api_key)
-    # Test the client with a simple completion to verify it works
-    test_response = co.generate(
-        model='command',
-        prompt='Say "test"',
-        max_tokens=5
-    )
-    print("Cohere client initialized successfully")
-except Exception as e:
-    print(f"Error initializing Cohere client: {str(e)}")
-    raise
-
-@app.route('/test', methods=['GET'])
+from batch import BATCH_MAX_ITEMS, jobs, run_batch
+from fallback import fallback_day
+from llm import COHERE_TIMEOUT, check_readiness, get_client
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    FALLBACK_DAYS,
+    annotate,
+    current_request,
+    finish_request,
+    record_tokens,
+    render_metrics,
+    span,
+    start_request
+)
+from plan_parser import PlanStreamParser
+from planner import (
+    PlanRequest,
+    build_prompt,
+    generate_and_cache,
+    generation_params,
+    plan_cache,
+    plan_flight,
+    plan_response_body
+)
+
+bp = Blueprint('api', __name__)
+
+@bp.route('/test', methods=['GET'])
 def test():
     return jsonify({"status": "Backend server is running"}), 200
 
-@app.route('/generate-plan', methods=['POST'])
+@bp.route('/ready', methods=['GET'])
+def ready():
+    # Readiness is probed against Cohere at most once per READINESS_TTL seconds
+    status = check_readiness()
+    return jsonify(status), 200 if status['ready'] else 503
+
+@bp.route('/cache-stats', methods=['GET'])
+def cache_stats():
+    stats = plan_cache.stats()
+    stats['singleflight'] = plan_flight.stats()
+    return jsonify(stats), 200
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
+
+@bp.before_request
+def start_request_log():
+    # Only plan requests get a request ID, timing spans and a sampled log line
+    if request.method == 'POST':
+        g.request_id = start_request(request.path, request.headers.get('X-Request-ID'))
+
+@bp.after_request
+def finish_request_log(response):
+    if g.get('request_id'):
+        response.headers['X-Request-ID'] = g.request_id
+        if response.is_streamed:
+            # A streamed body is produced after this hook, so close the record once it has been sent
+            log, status = current_request(), response.status_code
+            response.call_on_close(lambda: finish_request(status, log))
+        else:
+            finish_request(response.status_code)
+    return response
+
+@bp.route('/generate-plan', methods=['POST'])
 def generate_plan():
     try:
-        start_time = time.time()
-        
         # Check if API key is available
         if not os.getenv('COHERE_API_KEY'):
             return jsonify({'error': 'Cohere API key not found'}), 500
 
-        # Log incoming request
-        data = request.json
-        print("Received form data:", data)
-        
-        # Validate required fields
-        required_fields = ['fitnessLevel', 'goals', 'workoutDays']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'Missing required field: {field}'}), 400
-
-        # Create prompt for Cohere - optimized for faster response
-        selected_days = ', '.join(data['workoutDays'])
-        prompt = f"""Create a comprehensive split-based workout plan for a {data['fitnessLevel']} level person focusing on {data['goals']}, training on these days: {selected_days}.
-{f'Accommodate for: {data["disabilities"]}.' if data.get('disabilities') else ''}
-{f'Additional requirements: {data["requirements"]}.' if data.get('requirements') else ''}
-
-[FOCUS]
-Brief program focus explaining the split routine structure and its effectiveness for the user's goals.
-[/FOCUS]
-
-Organize the workouts in a Push/Pull/Legs split or Upper/Lower split based on the number of workout days.
-For each day, provide 3-5 exercises that target the day's muscle groups, using this format:
-[Day]:
-- [Exercise]: [Sets] x [Reps] (Rest [Time])
-  [EXPLANATION]: Brief explanation of form, safety, and muscle engagement
-
-Example:
-(Mon (Push):
- - Incline Push-ups: 3 x 12 (Rest 90s)
-  [EXPLANATION]: Keep core tight, hands shoulder-width, focus on chest engagement
- - Shoulder Press: 3 x 10 (Rest 90s)
-  [EXPLANATION]: Stand or sit with back straight, press directly overhead
- - Diamond Push-ups: 3 x 8 (Rest 90s)
-  [EXPLANATION]: Hands close together, elbows tucked for tricep focus
- - Lateral Raises: 3 x 12 (Rest 60s)
-  [EXPLANATION]: Slight bend in elbows, controlled movement
-
-Wed (Pull):
- - Inverted Rows: 3 x 10 (Rest 90s)
-  [EXPLANATION]: Use table or bar, keep body straight, squeeze shoulder blades
- - Face Pulls: 3 x 15 (Rest 60s)
-  [EXPLANATION]: Pull toward face level, focus on rear deltoids
- - Chin-ups or Band Pull-downs: 3 x 8 (Rest 90s)
-  [EXPLANATION]: Focus on lat engagement, controlled negative
- - Reverse Flyes: 3 x 12 (Rest 60s)
-  [EXPLANATION]: Bend forward, keep back straight, squeeze shoulder blades)
-
-IMPORTANT: 
-- Provide exercises for ALL of these days: {selected_days}
-- Each day should focus on specific muscle groups following the split pattern
-- Include 3-5 exercises per day with proper progression
-- Adjust exercise difficulty based on the {data['fitnessLevel']} fitness level"""
-
-        print("Sending prompt to Cohere:", prompt)
-
-        try:
-            # Generate response using Cohere with optimized parameters
-            response = co.generate(
-                model='command',
-                prompt=prompt,
-                max_tokens=2500,  # Increased for more complete responses
-                temperature=0.7,  # Increased for more creative responses
-                k=0,
-                stop_sequences=["\n\n\n"],
-                return_likelihoods='NONE'
-            )
-            
-            plan = response.generations[0].text.strip()
-            print("Received response from Cohere:", plan[:100] + "...")
-            
-            # Process the response to ensure consistent formatting
-            lines = plan.split('\n')
-            formatted_lines = []
-            current_day = None
-            
-            # First, find and extract the [FOCUS] section
-            focus_section = ""
-            in_focus = False
-            remaining_lines = []
-            
-            for line in lines:
-                if "[FOCUS]" in line:
-                    in_focus = True
-                    continue
-                elif "[/FOCUS]" in line:
-                    in_focus = False
-                    continue
-                elif in_focus:
-                    focus_section += line + "\n"
-                else:
-                    remaining_lines.append(line)
-            
-            # Determine split type based on number of workout days
-            total_days = len(data['workoutDays'])
-            if total_days <= 3:
-                split_type = "Upper/Lower"
-                split_mapping = {0: "Upper", 1: "Lower", 2: "Upper"}
-            else:
-                split_type = "Push/Pull/Legs"
-                split_mapping = {0: "Push", 1: "Pull", 2: "Legs"}
-            
-            # Then process the exercise days
-            for line in remaining_lines:
-                line = line.strip()
-                if not line:
-                    continue
-                
-                # Check if line starts with a day
-                day_prefixes = data['workoutDays'] + [d + ':' for d in data['workoutDays']]
-                is_day_header = any(line.lower().startswith(day.lower()) for day in day_prefixes)
-                
-                if is_day_header:
-                    if current_day:  # Add spacing between days
-                        formatted_lines.append('')
-                    # Extract day and add split type
-                    day = next(d for d in day_prefixes if line.lower().startswith(d.lower()))
-                    day_index = data['workoutDays'].index(day.rstrip(':'))
-                    split = split_mapping[day_index % len(split_mapping)]
-                    current_day = f"{day.rstrip(':')} ({split}):"
-                    formatted_lines.append(current_day)
-                elif line.startswith('-'):
-                    # Ensure exercise format is correct
-                    if ':' in line and 'x' in line.lower():
-                        # Standardize rest time format
-                        if '(Rest' in line:
-                            line = line.replace('seconds', 's').replace('second', 's')
-                            if not line.endswith(')'):
-                                line += ')'
-                        formatted_lines.append(line)
-                    else:
-                        # Try to fix common formatting issues
-                        parts = line.split('-', 1)[1].strip().split(':', 1)
-                        if len(parts) == 2:
-                            exercise_name = parts[0].strip()
-                            details = parts[1].strip()
-                            formatted_lines.append(f"- {exercise_name}: {details}")
-                        else:
-                            formatted_lines.append(line)
-                elif line.startswith('[EXPLANATION]'):
-                    # Ensure explanation is properly indented and formatted
-                    formatted_lines.append('  ' + line)
-                else:
-                    # If it's an exercise without a dash, add one
-                    formatted_lines.append(f"- {line}")
-            
-            formatted_plan = '\n'.join(formatted_lines)
-            
-            # Ensure each selected day has at least one exercise
-            for day in data['workoutDays']:
-                day_found = False
-                for line in formatted_lines:
-                    if line.lower().startswith(day.lower() + ':'):
-                        day_found = True
-                        break
-                if not day_found:
-                    # Determine workout split based on number of workout days
-                    total_days = len(data['workoutDays'])
-                    day_index = data['workoutDays'].index(day)
-                    
-                    # Default split-based exercises
-                    splits = {
-                        'push': {
-                            'beginner': [
-                                ('Push-ups', '3 x 10', 'Keep core tight, modify on knees if needed'),
-                                ('Wall Pike Push-ups', '3 x 8', 'Walk feet closer to wall for more difficulty'),
-                                ('Tricep Dips on Chair', '3 x 8', 'Keep elbows close to body, lower slowly'),
-                                ('Incline Push-ups', '3 x 10', 'Higher surface for less difficulty, focus on chest')
-                            ],
-                            'intermediate': [
-                                ('Diamond Push-ups', '3 x 12', 'Keep elbows close, focus on triceps'),
-                                ('Pike Push-ups', '3 x 10', 'Progress toward handstand push-up'),
-                                ('Dips', '3 x 10', 'Full range of motion, chest forward for chest focus'),
-                                ('Decline Push-ups', '3 x 12', 'Elevate feet, focus on upper chest')
-                            ],
-                            'advanced': [
-                                ('Handstand Push-ups', '3 x 8', 'Use wall for balance, focus on shoulder strength'),
-                                ('Ring Push-ups', '3 x 12', 'Control the rings, keep body tight'),
-                                ('Weighted Dips', '3 x 10', 'Add weight as you progress'),
-                                ('Planche Push-up Progression', '3 x 6', 'Start with tuck planche, progress slowly')
-                            ]
-                        },
-                        'pull': {
-                            'beginner': [
-                                ('Inverted Rows', '3 x 10', 'Use table or low bar, keep body straight'),
-                                ('Band Pull-aparts', '3 x 12', 'Focus on squeezing shoulder blades'),
-                                ('Negative Pull-ups', '3 x 5', 'Lower slowly, focus on control'),
-                                ('Face Pulls with Band', '3 x 15', 'Pull to face level, focus on rear delts')
-                            ],
-                            'intermediate': [
-                                ('Pull-ups', '3 x 8', 'Full range of motion, engage lats'),
-                                ('Australian Pull-ups', '3 x 12', 'Feet elevated for more difficulty'),
-                                ('Scapular Pulls', '3 x 12', 'Focus on shoulder blade movement'),
-                                ('Band Rows', '3 x 15', 'Squeeze shoulder blades, keep elbows close')
-                            ],
-                            'advanced': [
-                                ('Weighted Pull-ups', '3 x 8', 'Add weight progressively'),
-                                ('L-Sit Pull-ups', '3 x 8', 'Maintain L position throughout'),
-                                ('Front Lever Rows', '3 x 6', 'Start with tuck position'),
-                                ('One Arm Pull-up Progression', '3 x 5', 'Start with assisted variations')
-                            ]
-                        },
-                        'legs': {
-                            'beginner': [
-                                ('Bodyweight Squats', '3 x 12', 'Keep chest up, push through heels'),
-                                ('Lunges', '3 x 10/leg', 'Step forward, knee behind toes'),
-                                ('Glute Bridges', '3 x 15', 'Squeeze glutes at top'),
-                                ('Calf Raises', '3 x 20', 'Full range of motion, pause at top')
-                            ],
-                            'intermediate': [
-                                ('Jump Squats', '3 x 10', 'Land softly, immediately sink into next rep'),
-                                ('Walking Lunges', '3 x 12/leg', 'Keep torso upright, alternate legs'),
-                                ('Single Leg Glute Bridges', '3 x 12/leg', 'Keep hips level'),
-                                ('Split Squats', '3 x 10/leg', 'Control the movement, keep front knee stable')
-                            ],
-                            'advanced': [
-                                ('Pistol Squats', '3 x 8/leg', 'Control descent, maintain balance'),
-                                ('Plyometric Lunges', '3 x 10/leg', 'Explosive movement, land softly'),
-                                ('Nordic Hamstring Curls', '3 x 6', 'Control lowering phase'),
-                                ('Box Jumps', '3 x 8', 'Land softly, step down between reps')
-                            ]
-                        }
-                    }
-                    
-                    # Determine split type based on workout frequency
-                    if total_days <= 3:
-                        # Full body or Upper/Lower split
-                        split_type = 'push' if day_index % 2 == 0 else 'pull'
-                    else:
-                        # Push/Pull/Legs split
-                        split_type = ['push', 'pull', 'legs'][day_index % 3]
-                    
-                    level = data.get('fitnessLevel', 'beginner')
-                    exercises = splits[split_type][level]
-                    
-                    # Add the exercises to the plan
-                    formatted_plan += f"\n\n{day} ({split_type.capitalize()}):"
-                    for exercise, sets_reps, explanation in exercises:
-                        formatted_plan += f"\n- {exercise}: {sets_reps} (Rest 90s)\n  [EXPLANATION]: {explanation}"
-            
-            end_time = time.time()
-            print(f"Total processing time: {end_time - start_time:.2f} seconds")
-            
-            return jsonify({
-                'plan': formatted_plan,
-                'focus': focus_section.strip()
-            })
-
-        except Exception as cohere_error:
-            print("Cohere API error:", str(cohere_error))
-            return jsonify({'error': f'Cohere API error: {str(cohere_error)}'}), 500
+        plan_request = PlanRequest(request.get_json(silent=True), request.args)
+        reply = plan_request.prepare()
+        if reply is None:
+            key, data, mode = plan_request.key, plan_request.data, plan_request.mode
+            try:
+                # Identical forms already being generated wait for that result instead of calling Cohere again
+                result, shared = plan_flight.do(
+                    key,
+                    lambda: generate_and_cache(key, data, mode),
+                    recheck=None if plan_request.bypass_cache else (lambda: plan_cache.peek(key))
+                )
+                reply = plan_request.generated(result, shared)
+            except Exception as cohere_error:
+                reply = plan_request.failed(cohere_error)
+
+        body, status, headers = reply
+        return jsonify(body), status, headers
 
     except Exception as e:
-        print("Server error:", str(e))
+        annotate(outcome='server_error', error=str(e))
         return jsonify({'error': f'Server error: {str(e)}'}), 500
 
+def stream_plan_events(key, data, prepared=None):
+    """Yield plan events as NDJSON lines, replaying a ``prepared`` plan instead of calling Cohere if given."""
+    parser = PlanStreamParser(data['workoutDays'])
+    try:
+        if prepared is not None:
+            if prepared['focus']:
+                yield json.dumps({'type': 'focus', 'text': prepared['focus']}) + '\n'
+            for day in prepared['days']:
+                yield json.dumps({'type': 'day', 'day': day['day'], 'split': day['split'], 'fallback': day['fallback']}) + '\n'
+                for exercise in day['exercises']:
+                    yield json.dumps({'type': 'exercise', 'day': day['day'], 'exercise': exercise}) + '\n'
+            result = prepared
+        else:
+            prompt = build_prompt(data)
+            # The stream span covers the whole upstream completion, with parsing interleaved; it
+            # counts toward LLM_MAX_IN_FLIGHT like any other generation
+            with plan_flight.running(), span('stream'):
+                stream = get_client(stream=True).generate(prompt=prompt, stream=True, **generation_params(data))
+                # The client's timeout bounds each read; this bounds an upstream that keeps trickling
+                deadline = time.monotonic() + COHERE_TIMEOUT
+                for token in stream:
+                    if time.monotonic() > deadline:
+                        raise TimeoutError(f'the completion did not finish within {COHERE_TIMEOUT:g}s')
+                    for event in parser.feed(token.text):
+                        yield json.dumps(event) + '\n'
+                for event in parser.close():
+                    yield json.dumps(event) + '\n'
+            record_tokens(prompt, ''.join(stream.texts), stream.generations.meta if stream.generations else None)
+
+            # Days the model skipped are filled once the completion has finished
+            missing = parser.missing_days()
+            FALLBACK_DAYS.inc(len(missing))
+            for day in missing:
+                for event in parser.add_fallback_day(fallback_day(data['workoutDays'], day, data['fitnessLevel'])):
+                    yield json.dumps(event) + '\n'
+
+            result = parser.result()
+            plan_cache.set(key, result)
+
+        yield json.dumps({'type': 'done', **plan_response_body(result, 'json')}) + '\n'
+
+    except Exception as cohere_error:
+        annotate(outcome='upstream_error', error=str(cohere_error))
+        yield json.dumps({'type': 'error', 'error': f'Cohere API error: {str(cohere_error)}'}) + '\n'
+
+@bp.route('/generate-plan/stream', methods=['POST'])
+def generate_plan_stream():
+    """Stream the plan as NDJSON: focus, then each day and exercise as soon as it is parsed.
+
+    The last line is a ``done`` event carrying the same body as
+    /generate-plan?format=json, or an ``error`` event if generation failed.
+    """
+    try:
+        # Check if API key is available
+        if not os.getenv('COHERE_API_KEY'):
+            return jsonify({'error': 'Cohere API key not found'}), 500
+
+        plan_request = PlanRequest(request.get_json(silent=True), request.args)
+        reply = plan_request.validate()
+        if reply is not None:
+            body, status, headers = reply
+            return jsonify(body), status, headers
+
+        # A cached or fallback plan is replayed as events instead of calling Cohere
+        prepared, _, source = plan_request.ready_plan()
+        if prepared is None:
+            annotate(outcome='streamed')
+        response = Response(
+            stream_with_context(stream_plan_events(plan_request.key, plan_request.data, prepared)),
+            mimetype='application/x-ndjson',
+            headers=plan_request.headers(source)
+        )
+        # Ask reverse proxies not to buffer the stream
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    except Exception as e:
+        annotate(outcome='server_error', error=str(e))
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@bp.route('/generate-plans', methods=['POST'])
+def generate_plans():
+    """Generate plans for a list of forms, e.g. a coach's whole roster.
+
+    The body is ``{"forms": [...]}``. Results are streamed as NDJSON, one
+    line per form in completion order, each tagged with the form's index.
+    With ``?async=1`` the batch runs in the background instead and the
+    response is a job ID to poll at /generate-plans/<job_id>.
+    """
+    try:
+        # Check if API key is available
+        if not os.getenv('COHERE_API_KEY'):
+            return jsonify({'error': 'Cohere API key not found'}), 500
+
+        body = request.get_json(silent=True)
+        forms = body.get('forms') if isinstance(body, dict) else None
+        if not isinstance(forms, list) or not forms:
+            annotate(outcome='invalid')
+            return jsonify({'error': 'Request body must be {"forms": [...]} with at least one form'}), 400
+        if len(forms) > BATCH_MAX_ITEMS:
+            annotate(outcome='invalid')
+            return jsonify({'error': f'A batch can hold at most {BATCH_MAX_ITEMS} forms'}), 400
+        annotate(items=len(forms))
+
+        response_format = request.args.get('format', 'text').lower()
+        mode = request.args.get('mode', '')
+
+        if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+            job_id = jobs.submit(forms, response_format, mode)
+            annotate(outcome='queued')
+            return jsonify({'job_id': job_id, 'status_url': f'/generate-plans/{job_id}'}), 202
+
+        def stream_results():
+            failed = 0
+            for item in run_batch(forms, response_format, mode):
+                if item['status'] >= 500:
+                    failed += 1
+                    annotate(outcome='upstream_error', failed_items=failed, error=item['error'])
+                yield json.dumps(item) + '\n'
+
+        annotate(outcome='streamed')
+        response = Response(stream_with_context(stream_results()), mimetype='application/x-ndjson')
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    except Exception as e:
+        annotate(outcome='server_error', error=str(e))
+        return jsonify({'error': f'Server error: {str(e)}'}), 500
+
+@bp.route('/generate-plans/<job_id>', methods=['GET'])
+def batch_job(job_id):
+    # Results are sorted by form index; 'completed' counts the ones done so far
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    return jsonify(job), 200
+
+def create_app():
+    app = Flask(__name__)
+    CORS(app, resources={
+        r"/*": {
+            "origins": ["http://localhost:3000"],
+            "methods": ["GET", "POST", "OPTIONS"],
+            "allow_headers": ["Content-Type"]
+        }
+    })
+    app.register_blueprint(bp)
+    return app
+
+app = create_app()
+
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,252 @@
+"""asyncio serving mode for /test, /metrics and /generate-plan.
+
+Runs on aiohttp, which the Cohere SDK already depends on. One process holds
+many slow generations open at once instead of tying up a worker per request:
+
+    python async_app.py
+    gunicorn async_app:app --worker-class aiohttp.GunicornWebWorker
+
+Generations share a pooled ``cohere.AsyncClient`` and are bounded three ways:
+COHERE_TIMEOUT per upstream request, REQUEST_TIMEOUT per plan, and
+MAX_CONCURRENT_GENERATIONS across the process. Requests that cannot get a
+generation slot within QUEUE_TIMEOUT are turned away with 429 and Retry-After.
+"""
+import asyncio
+import os
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+# Load environment variables before the modules below read their settings
+load_dotenv()
+
+from llm import COHERE_POOL_SIZE, create_async_client
+from metrics import (
+    CONTENT_TYPE as METRICS_CONTENT_TYPE,
+    annotate,
+    finish_request,
+    record_tokens,
+    render_metrics,
+    span,
+    start_request
+)
+from planner import (
+    DAY_TIMEOUT,
+    PlanRequest,
+    build_prompt,
+    day_requests,
+    finish_per_day,
+    finish_plan,
+    generation_params,
+    plan_cache,
+    use_per_day
+)
+
+MAX_CONCURRENT_GENERATIONS = int(os.getenv('MAX_CONCURRENT_GENERATIONS', str(COHERE_POOL_SIZE)))
+QUEUE_TIMEOUT = float(os.getenv('QUEUE_TIMEOUT', '0.5'))
+REQUEST_TIMEOUT = float(os.getenv('REQUEST_TIMEOUT', '60'))
+RETRY_AFTER = int(os.getenv('RETRY_AFTER', '5'))
+ALLOWED_ORIGINS = {"http://localhost:3000"}
+
+
+class Overloaded(Exception):
+    pass
+
+
+async def off_loop(fn, *args):
+    """Call ``fn`` in a worker thread when the plan cache has its SQLite tier, whose calls block."""
+    if plan_cache.db_path:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
+class AsyncPlanner:
+    """Runs Cohere generations for one event loop.
+
+    Identical requests share one generation task, so a caller that
+    disconnects does not cancel the work others are waiting for.
+    """
+
+    def __init__(self, client, max_concurrent):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = {}
+        self.counters = {'generations': 0, 'coalesced': 0, 'rejected': 0, 'timeouts': 0}
+
+    async def generate(self, key, data, mode=''):
+        """Return ``(result, shared)`` for a validated form, starting a generation only if none is running."""
+        task = self.in_flight.get(key)
+        shared = task is not None
+        if shared:
+            self.counters['coalesced'] += 1
+        else:
+            task = asyncio.ensure_future(self._generate_and_cache(key, data, use_per_day(mode)))
+            self.in_flight[key] = task
+            task.add_done_callback(lambda _: self.in_flight.pop(key, None))
+        return await asyncio.shield(task), shared
+
+    async def _generate_and_cache(self, key, data, per_day=False):
+        if self.semaphore.locked() and QUEUE_TIMEOUT <= 0:
+            self.counters['rejected'] += 1
+            raise Overloaded()
+        try:
+            await asyncio.wait_for(self.semaphore.acquire(), QUEUE_TIMEOUT or None)
+        except asyncio.TimeoutError:
+            self.counters['rejected'] += 1
+            raise Overloaded()
+
+        # A per-day plan holds one slot for all of its completions
+        complete = True
+        try:
+            self.counters['generations'] += 1
+            if per_day:
+                result, complete = await self._generate_per_day(data)
+            else:
+                with span('prompt'):
+                    prompt = build_prompt(data)
+                with span('upstream'):
+                    response = await asyncio.wait_for(
+                        self.client.generate(prompt=prompt, **generation_params(data)),
+                        REQUEST_TIMEOUT
+                    )
+        except asyncio.TimeoutError:
+            self.counters['timeouts'] += 1
+            raise
+        finally:
+            self.semaphore.release()
+
+        if not per_day:
+            completion = response.generations[0].text.strip()
+            record_tokens(prompt, completion, response.meta)
+            result = finish_plan(completion, data)
+        # Plans with days lost to upstream errors are degraded and not cached
+        if complete:
+            await off_loop(plan_cache.set, key, result)
+        return result
+
+    async def _generate_per_day(self, data):
+        """Request every day and the focus at once and return ``(result, complete)`` like ``finish_per_day``."""
+        with span('prompt'):
+            days, (focus_prompt, focus_params) = day_requests(data)
+        with span('upstream'):
+            tasks = {
+                asyncio.ensure_future(self.client.generate(prompt=prompt, **params)): day
+                for day, (prompt, params) in days.items()
+            }
+            focus_task = asyncio.ensure_future(self.client.generate(prompt=focus_prompt, **focus_params))
+            done, pending = await asyncio.wait([*tasks, focus_task], timeout=min(DAY_TIMEOUT, REQUEST_TIMEOUT))
+        for task in pending:
+            task.cancel()
+
+        responses = {day: task.exception() or task.result() for task, day in tasks.items() if task in done}
+        focus_response = None
+        if focus_task in done and focus_task.exception() is None:
+            focus_response = focus_task.result()
+        return finish_per_day(data, days, focus_prompt, responses, focus_response)
+
+    def is_in_flight(self, key):
+        return key in self.in_flight
+
+    def stats(self):
+        return {**self.counters, 'in_flight': len(self.in_flight)}
+
+
+planner_key = web.AppKey('planner', AsyncPlanner)
+routes = web.RouteTableDef()
+
+
+@web.middleware
+async def cors_middleware(request, handler):
+    origin = request.headers.get('Origin')
+    if request.method == 'OPTIONS':
+        response = web.Response()
+    else:
+        response = await handler(request)
+    if origin in ALLOWED_ORIGINS:
+        response.headers['Access-Control-Allow-Origin'] = origin
+        response.headers['Access-Control-Allow-Methods'] = 'POST, OPTIONS'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type'
+    return response
+
+
+@web.middleware
+async def request_log_middleware(request, handler):
+    # Only plan requests get a request ID, timing spans and a sampled log line; paths that
+    # match no route are left out so clients cannot mint new metric series
+    if request.method != 'POST' or request.match_info.http_exception is not None:
+        return await handler(request)
+    endpoint = request.match_info.route.resource.canonical
+    request_id = start_request(endpoint, request.headers.get('X-Request-ID'))
+    try:
+        response = await handler(request)
+    except web.HTTPException as e:
+        finish_request(e.status)
+        raise
+    response.headers['X-Request-ID'] = request_id
+    finish_request(response.status)
+    return response
+
+
+@routes.get('/test')
+async def test(request):
+    return web.json_response({"status": "Backend server is running"})
+
+
+@routes.get('/cache-stats')
+async def cache_stats(request):
+    stats = plan_cache.stats()
+    stats['async'] = request.app[planner_key].stats()
+    return web.json_response(stats)
+
+
+@routes.get('/metrics')
+async def metrics(request):
+    return web.Response(body=render_metrics(), headers={'Content-Type': METRICS_CONTENT_TYPE})
+
+
+@routes.post('/generate-plan')
+async def generate_plan(request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+
+    planner = request.app[planner_key]
+    plan_request = PlanRequest(data, request.query)
+    reply = await off_loop(plan_request.prepare, planner)
+    if reply is None:
+        try:
+            result, shared = await planner.generate(plan_request.key, plan_request.data, plan_request.mode)
+            reply = plan_request.generated(result, shared)
+        except Overloaded:
+            annotate(outcome='rejected')
+            reply = (
+                {'error': 'Server is busy, please retry shortly'},
+                429,
+                {'Retry-After': str(RETRY_AFTER)}
+            )
+        except Exception as cohere_error:
+            reply = plan_request.failed(cohere_error)
+
+    body, status, headers = reply
+    return web.json_response(body, status=status, headers=headers)
+
+
+async def planner_context(app):
+    client = create_async_client()
+    app[planner_key] = AsyncPlanner(client, MAX_CONCURRENT_GENERATIONS)
+    yield
+    await client.close()
+
+
+def create_app():
+    app = web.Application(middlewares=[cors_middleware, request_log_middleware])
+    app.add_routes(routes)
+    app.cleanup_ctx.append(planner_context)
+    return app
+
+
+app = create_app()
+
+if __name__ == '__main__':
+    web.run_app(app, port=int(os.getenv('PORT', '5000')))
@@ -0,0 +1,140 @@
+"""Bulk plan generation for /generate-plans.
+
+A batch is a list of form payloads. Each form goes through the same
+validation, cache and generation path as /generate-plan; identical forms
+(by cache key) are generated once and their result is fanned back out to
+every index that asked for it. Distinct generations run on one executor per
+process, so BATCH_MAX_PARALLEL bounds upstream parallelism across all
+batches at once.
+"""
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from fallback import fallback_plan
+from llm import is_timeout
+from plan_cache import cache_key
+from planner import generate_and_cache, plan_cache, plan_flight, plan_response_body, use_fallback_only, validate_form
+
+BATCH_MAX_PARALLEL = int(os.getenv('BATCH_MAX_PARALLEL', '8'))
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '100'))
+# Seconds a finished job's results stay available for polling
+JOB_TTL = float(os.getenv('JOB_TTL', '3600'))
+
+_executor = ThreadPoolExecutor(BATCH_MAX_PARALLEL, thread_name_prefix='plan-batch')
+
+
+def _generate(key, data, mode):
+    return plan_flight.do(key, lambda: generate_and_cache(key, data, mode), recheck=lambda: plan_cache.peek(key))[0]
+
+
+def run_batch(forms, response_format='text', mode=''):
+    """Yield one result dict per form, in completion order.
+
+    Each dict has the form's ``index`` and ``status`` plus either ``plan``
+    (the /generate-plan response body) or ``error``. Invalid forms, cache
+    hits and fallback-only plans come back first; ``deduplicated`` marks
+    indexes that shared another index's generation.
+    """
+    groups = {}
+    forms_by_key = {}
+    for index, form in enumerate(forms):
+        # One bad item gets its own error instead of ending the batch
+        try:
+            error = validate_form(form)
+            key = None if error else cache_key(form)
+        except Exception as e:
+            error = f'Invalid form: {str(e)}'
+        if error:
+            yield {'index': index, 'status': 400, 'error': error}
+            continue
+        groups.setdefault(key, []).append(index)
+        forms_by_key.setdefault(key, form)
+
+    futures = {}
+    for key, indexes in groups.items():
+        cached = plan_cache.get(key)
+        if cached is not None:
+            body = plan_response_body(cached, response_format)
+            for n, index in enumerate(indexes):
+                yield {'index': index, 'status': 200, 'cache': 'hit', 'deduplicated': n > 0, 'plan': body}
+        elif use_fallback_only(key, mode):
+            result, text = fallback_plan(forms_by_key[key])
+            body = plan_response_body(result, response_format, text)
+            for n, index in enumerate(indexes):
+                yield {'index': index, 'status': 200, 'source': 'fallback', 'deduplicated': n > 0, 'plan': body}
+        else:
+            futures[_executor.submit(_generate, key, forms_by_key[key], mode)] = key
+
+    for future in as_completed(futures):
+        indexes = groups[futures[future]]
+        try:
+            body = plan_response_body(future.result(), response_format)
+        except Exception as cohere_error:
+            status = 504 if is_timeout(cohere_error) else 500
+            for index in indexes:
+                yield {'index': index, 'status': status, 'error': f'Cohere API error: {str(cohere_error)}'}
+            continue
+        for n, index in enumerate(indexes):
+            yield {'index': index, 'status': 200, 'cache': 'miss', 'deduplicated': n > 0, 'plan': body}
+
+
+class JobStore:
+    """In-process registry of batches run in the background and polled by ID.
+
+    Jobs live in the worker that accepted them, so polling needs the same
+    worker (a single worker or sticky sessions).
+    """
+
+    def __init__(self, ttl=JOB_TTL):
+        self.ttl = ttl
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, forms, response_format='text', mode=''):
+        job_id = uuid.uuid4().hex
+        job = {
+            'id': job_id,
+            'status': 'running',
+            'total': len(forms),
+            'completed': 0,
+            'results': [],
+            'error': None,
+            'finished_at': None
+        }
+        with self._lock:
+            self._expire()
+            self._jobs[job_id] = job
+        threading.Thread(target=self._run, args=(job, forms, response_format, mode), daemon=True).start()
+        return job_id
+
+    def _run(self, job, forms, response_format, mode):
+        try:
+            for item in run_batch(forms, response_format, mode):
+                with self._lock:
+                    job['results'].append(item)
+                    job['completed'] += 1
+            status, error = 'done', None
+        except Exception as e:
+            status, error = 'failed', str(e)
+        with self._lock:
+            job['status'] = status
+            job['error'] = error
+            job['finished_at'] = time.time()
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {**job, 'results': sorted(job['results'], key=lambda r: r['index'])}
+
+    def _expire(self):
+        now = time.time()
+        for job_id in [j for j, job in self._jobs.items() if job['finished_at'] and now - job['finished_at'] > self.ttl]:
+            del self._jobs[job_id]
+
+
+jobs = JobStore()
@@ -0,0 +1,94 @@
+"""Compare one /generate-plans batch against the same forms sent one by one.
+
+Run it against a server backed by the fake Cohere endpoint so the numbers
+reflect the serving path rather than the model:
+
+    python bench/fake_cohere.py --port 8080 --latency 2
+    CO_API_URL=http://localhost:8080 COHERE_API_KEY=fake python app.py
+    python bench/batch_bench.py --url http://localhost:5000 --forms 20 --duplicates 5
+
+Every run tags its forms with a fresh ID, and the sequential and batch
+phases use different tags, so neither phase is served from the other's
+cache. Prints a JSON summary of both phases and the speedup.
+"""
+import argparse
+import asyncio
+import json
+import time
+import uuid
+
+import aiohttp
+
+from loadtest import make_forms
+
+
+def tagged_forms(count, duplicates, tag):
+    """Return ``count`` distinct forms plus ``duplicates`` repeats of them, all unique to ``tag``."""
+    forms = [{**form, 'requirements': f'{form.get("requirements", "")} bench {tag}'.strip()}
+             for form in make_forms(count)]
+    return forms + [dict(forms[i % count]) for i in range(duplicates)]
+
+
+async def run_sequential(session, url, forms):
+    statuses = {}
+    started = time.perf_counter()
+    for form in forms:
+        async with session.post(f'{url}/generate-plan', json=form) as response:
+            await response.read()
+            statuses[str(response.status)] = statuses.get(str(response.status), 0) + 1
+    return {'elapsed_s': round(time.perf_counter() - started, 3), 'statuses': statuses}
+
+
+async def run_batch(session, url, forms):
+    statuses = {}
+    first_result = None
+    started = time.perf_counter()
+    async with session.post(f'{url}/generate-plans', json={'forms': forms}) as response:
+        if response.status != 200:
+            return {'error': f'HTTP {response.status}: {await response.text()}'}
+        async for line in response.content:
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            if first_result is None:
+                first_result = time.perf_counter() - started
+            status = str(item['status'])
+            statuses[status] = statuses.get(status, 0) + 1
+    return {
+        'elapsed_s': round(time.perf_counter() - started, 3),
+        'first_result_s': round(first_result, 3) if first_result is not None else None,
+        'statuses': statuses
+    }
+
+
+async def run(url, count, duplicates, timeout):
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(timeout=client_timeout) as session:
+        sequential = await run_sequential(session, url, tagged_forms(count, duplicates, uuid.uuid4().hex))
+        batch = await run_batch(session, url, tagged_forms(count, duplicates, uuid.uuid4().hex))
+
+    summary = {
+        'url': url,
+        'forms': count + duplicates,
+        'distinct_forms': count,
+        'sequential': sequential,
+        'batch': batch
+    }
+    if batch.get('elapsed_s'):
+        summary['speedup'] = round(sequential['elapsed_s'] / batch['elapsed_s'], 2)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000', help='base URL of the Flask server')
+    parser.add_argument('--forms', type=int, default=20, help='number of distinct forms')
+    parser.add_argument('--duplicates', type=int, default=0, help='extra copies of those forms to add')
+    parser.add_argument('--timeout', type=float, default=600)
+    args = parser.parse_args()
+    summary = asyncio.run(run(args.url.rstrip('/'), args.forms, args.duplicates, args.timeout))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Local stand-in for Cohere's /v1/generate endpoint.
+
+Answers after a configurable delay with a well-formed plan for the days
+named in the prompt, so the servers can be load tested without an API key:
+
+    python bench/fake_cohere.py --port 8080 --latency 3
+    CO_API_URL=http://localhost:8080 COHERE_API_KEY=fake python async_app.py
+
+Both the buffered and the streaming (``"stream": true``) forms are supported.
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import uuid
+
+from aiohttp import web
+
+DAYS_RE = re.compile(r'training on these days: ([^.\n]+)')
+SESSION_RE = re.compile(r'Session: (\w+)')
+# Prompts using the compact template ask for one-line exercises with a '| cue' suffix
+COMPACT_MARKER = ') | '
+EXERCISES = [
+    ('Push-ups', '3 x 12', 90, 'Keep core tight, lower chest to the floor'),
+    ('Inverted Rows', '3 x 10', 90, 'Keep body straight, squeeze shoulder blades'),
+    ('Bodyweight Squats', '3 x 15', 60, 'Chest up, push through heels'),
+    ('Plank', '3 x 30s', 45, 'Brace the core, keep hips level'),
+]
+
+
+def synthesize_completion(prompt):
+    """Build a plan completion in the format the prompt asks for (verbose, compact, one session or focus only)."""
+    focus_line = '[FOCUS] A balanced split built for steady progress. [/FOCUS]'
+    session = SESSION_RE.search(prompt)
+    if session:
+        return '\n'.join(f'- {name}: {sets_reps} (Rest {rest}s) | {explanation}'
+                         for name, sets_reps, rest, explanation in EXERCISES)
+    match = DAYS_RE.search(prompt)
+    if not match and '[FOCUS]' in prompt and COMPACT_MARKER not in prompt:
+        return focus_line
+
+    days = [d.strip() for d in match.group(1).split(',')] if match else ['Mon']
+    if COMPACT_MARKER in prompt:
+        lines = [focus_line]
+        for day in days:
+            lines.append(f'{day}:')
+            lines.extend(f'- {name}: {sets_reps} (Rest {rest}s) | {explanation}'
+                         for name, sets_reps, rest, explanation in EXERCISES)
+        return '\n'.join(lines)
+
+    lines = ['[FOCUS]', 'A balanced split built for steady progress.', '[/FOCUS]', '']
+    for day in days:
+        lines.append(f'{day}:')
+        for name, sets_reps, rest, explanation in EXERCISES:
+            lines.append(f'- {name}: {sets_reps} (Rest {rest}s)')
+            lines.append(f'  [EXPLANATION]: {explanation}')
+        lines.append('')
+    return '\n'.join(lines)
+
+
+class FakeCohere:
+    def __init__(self, latency=1.0, jitter=0.0, completion_fn=synthesize_completion, token_latency=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.token_latency = token_latency
+        self.completion_fn = completion_fn
+        self.requests = 0
+
+    def delay(self, text=''):
+        # Decoding time grows with the completion, at ~4 characters per token
+        decode = self.token_latency * (len(text) // 4)
+        return max(0.0, self.latency + decode + random.uniform(-self.jitter, self.jitter))
+
+    async def generate(self, request):
+        body = await request.json()
+        self.requests += 1
+        text = self.completion_fn(body.get('prompt') or '')
+        generation = {'id': str(uuid.uuid4()), 'text': text, 'finish_reason': 'COMPLETE'}
+        response_body = {'id': str(uuid.uuid4()), 'generations': [generation], 'prompt': body.get('prompt'), 'meta': {}}
+
+        if not body.get('stream'):
+            await asyncio.sleep(self.delay(text))
+            return web.json_response(response_body)
+
+        # Stream the same text in small pieces spread over the configured latency
+        response = web.StreamResponse(headers={'Content-Type': 'application/stream+json'})
+        await response.prepare(request)
+        pieces = [text[i:i + 16] for i in range(0, len(text), 16)] or ['']
+        pause = self.delay(text) / len(pieces)
+        for piece in pieces:
+            await asyncio.sleep(pause)
+            await response.write(json.dumps({'text': piece, 'is_finished': False}).encode() + b'\n')
+        final = {'is_finished': True, 'finish_reason': 'COMPLETE', 'response': response_body}
+        await response.write(json.dumps(final).encode() + b'\n')
+        await response.write_eof()
+        return response
+
+    async def check_api_key(self, request):
+        return web.json_response({'valid': True})
+
+    async def stats(self, request):
+        return web.json_response({'requests': self.requests})
+
+    def make_app(self):
+        app = web.Application()
+        app.router.add_post('/v1/generate', self.generate)
+        app.router.add_post('/v1/check-api-key', self.check_api_key)
+        app.router.add_get('/stats', self.stats)
+        return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency', type=float, default=1.0, help='seconds before a completion is returned')
+    parser.add_argument('--jitter', type=float, default=0.0, help='+/- seconds of random variation in latency')
+    parser.add_argument('--token-latency', type=float, default=0.0, help='extra seconds per completion token')
+    args = parser.parse_args()
+    fake = FakeCohere(args.latency, args.jitter, token_latency=args.token_latency)
+    web.run_app(fake.make_app(), host=args.host, port=args.port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Concurrent load generator for /generate-plan.
+
+Fires requests at a running server with a fixed number in flight and prints
+a JSON summary of status codes, throughput and latency percentiles:
+
+    python bench/loadtest.py --url http://localhost:5000/generate-plan --requests 500 --concurrency 300
+
+Use ``--distinct`` to control how many different forms are sent (so cache and
+coalescing effects can be included or excluded) and ``--nocache`` to bypass
+the plan cache entirely.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+import aiohttp
+
+LEVELS = ['beginner', 'intermediate', 'advanced']
+GOALS = ['strength', 'muscle', 'endurance', 'weight-loss']
+SCHEDULES = [
+    ['Mon', 'Wed', 'Fri'],
+    ['Tue', 'Thu'],
+    ['Mon', 'Tue', 'Thu', 'Fri'],
+    ['Mon', 'Tue', 'Wed', 'Thu', 'Fri'],
+    ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat'],
+]
+
+
+def make_forms(distinct):
+    combos = itertools.product(LEVELS, GOALS, SCHEDULES)
+    forms = []
+    for i, (level, goal, days) in enumerate(combos):
+        if i >= distinct:
+            break
+        forms.append({'fitnessLevel': level, 'goals': goal, 'workoutDays': days})
+    # Beyond the built-in combinations, free text keeps the forms distinct
+    while len(forms) < distinct:
+        forms.append({'fitnessLevel': 'beginner', 'goals': 'strength', 'workoutDays': ['Mon'],
+                      'requirements': f'variant {len(forms)}'})
+    return forms
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[index], 4)
+
+
+async def run(url, total, concurrency, forms, timeout):
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(forms[i % len(forms)])
+    latencies = []
+    statuses = {}
+
+    async def worker(session):
+        while True:
+            try:
+                form = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                async with session.post(url, json=form) as response:
+                    await response.read()
+                    status = str(response.status)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'url': url,
+        'requests': total,
+        'concurrency': concurrency,
+        'distinct_forms': len(forms),
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(total / elapsed, 2) if elapsed else None,
+        'statuses': statuses,
+        'latency_s': {
+            'p50': percentile(latencies, 50),
+            'p90': percentile(latencies, 90),
+            'p99': percentile(latencies, 99),
+            'max': round(latencies[-1], 4) if latencies else None,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:5000/generate-plan')
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--distinct', type=int, default=1000, help='number of different forms to cycle through')
+    parser.add_argument('--nocache', action='store_true', help='append ?nocache=1 to every request')
+    parser.add_argument('--timeout', type=float, default=300)
+    args = parser.parse_args()
+
+    url = (args.url + ('&' if '?' in args.url else '?') + 'nocache=1') if args.nocache else args.url
+    summary = asyncio.run(run(url, args.requests, args.concurrency, make_forms(args.distinct), args.timeout))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
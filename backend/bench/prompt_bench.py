@@ -0,0 +1,121 @@
+"""Offline comparison of the prompt templates.
+
+Prompt sizes come from rendering each sample form with every template.
+Completion sizes and parse success come from the corpus completions
+recorded for that template (entries whose ``template`` field names it),
+each cut off at the template's max_tokens budget and parsed. Nothing
+leaves the machine:
+
+    python bench/prompt_bench.py
+    python bench/prompt_bench.py --templates verbose compact --prefill-ms 0.3 --decode-ms 25
+
+Token counts use the same ~4 characters per token estimate as the metrics.
+Model latency is modelled as prefill (per prompt token) plus decode (per
+completion token), which is where generation time goes. Parse success is
+the share of days the parser found without falling back, and the share of
+exercises with sets, reps, rest and an explanation. Prints JSON.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from loadtest import make_forms
+from plan_parser import parse_plan
+from planner import validate_form
+from prompts import TEMPLATES
+from replay import load_corpus
+
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN
+
+
+def bench_template(template, forms, recorded, prefill_ms, decode_ms):
+    """Measure one template: prompts over ``forms``, completions over its ``recorded`` corpus entries."""
+    if not recorded:
+        raise SystemExit(f"No corpus completions are recorded for the {template.name} template")
+    prompt_tokens = [estimate_tokens(template.render(data)) for data in forms]
+    budgets = [template.max_tokens(len(data['workoutDays'])) for data in forms]
+
+    completion_tokens, parse_ms = [], []
+    days_total = days_parsed = exercises_total = exercises_complete = truncated = 0
+    for entry in recorded:
+        data = entry['form']
+        completion = entry['completion']
+        budget = template.max_tokens(len(data['workoutDays']))
+        # A real completion stops at max_tokens, so an undersized budget shows up as lost days
+        if estimate_tokens(completion) > budget:
+            completion = completion[:budget * CHARS_PER_TOKEN]
+            truncated += 1
+
+        start = time.perf_counter()
+        parser = parse_plan(completion, data['workoutDays'])
+        parse_ms.append((time.perf_counter() - start) * 1000)
+        completion_tokens.append(estimate_tokens(completion))
+
+        days_total += len(data['workoutDays'])
+        days_parsed += len(data['workoutDays']) - len(parser.missing_days())
+        for day in parser.result()['days']:
+            for exercise in day['exercises']:
+                exercises_total += 1
+                if (exercise['sets'] is not None and exercise['rest_seconds'] is not None
+                        and exercise['explanation']):
+                    exercises_complete += 1
+
+    return {
+        'recorded_completions': len(recorded),
+        'prompt_tokens': round(statistics.mean(prompt_tokens), 1),
+        'completion_tokens': round(statistics.mean(completion_tokens), 1),
+        'max_tokens': round(statistics.mean(budgets), 1),
+        'truncated_completions': truncated,
+        'model_latency_ms': round(
+            statistics.mean(prompt_tokens) * prefill_ms + statistics.mean(completion_tokens) * decode_ms, 1
+        ),
+        'parse_ms': round(statistics.mean(parse_ms), 4),
+        'days_parsed_rate': round(days_parsed / days_total, 4),
+        'exercise_parse_rate': round(exercises_complete / exercises_total, 4) if exercises_total else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--templates', nargs='+', default=list(TEMPLATES), choices=list(TEMPLATES))
+    parser.add_argument('--forms', type=int, default=60, help='number of distinct sample forms')
+    parser.add_argument('--prefill-ms', type=float, default=0.2, help='modelled milliseconds per prompt token')
+    parser.add_argument('--decode-ms', type=float, default=20.0, help='modelled milliseconds per completion token')
+    args = parser.parse_args()
+
+    forms = make_forms(args.forms)
+    for form in forms:
+        validate_form(form)
+    entries = load_corpus()
+
+    results = {
+        name: bench_template(
+            TEMPLATES[name], forms, [e for e in entries if e.get('template') == name], args.prefill_ms, args.decode_ms
+        )
+        for name in args.templates
+    }
+    summary = {
+        'forms': len(forms),
+        'prefill_ms_per_token': args.prefill_ms,
+        'decode_ms_per_token': args.decode_ms,
+        'templates': results
+    }
+    if 'verbose' in results:
+        baseline = results['verbose']['model_latency_ms']
+        summary['latency_vs_verbose'] = {
+            name: round(result['model_latency_ms'] / baseline, 3) for name, result in results.items()
+        }
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
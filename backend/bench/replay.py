@@ -0,0 +1,98 @@
+"""Deterministic stand-in for Cohere that replays a corpus of completions.
+
+``corpus.json`` holds recorded-style completions, each with the form that
+produced it and what parsing it should yield. A completion is served when
+its form's prompt is seen. Any other prompt, such as a per-day session or a
+form outside the corpus, gets the fake server's synthesized answer, so
+every path can run without a network.
+
+``ReplayClient`` replaces ``cohere.Client`` in-process via
+``llm.set_client``. ``replay_completion`` plugs the same corpus into
+``FakeCohere`` for servers that need a real HTTP endpoint.
+"""
+import json
+import os
+import time
+import uuid
+
+from cohere.responses.generation import Generations, StreamingText
+
+from fake_cohere import synthesize_completion
+from planner import build_prompt, validate_form
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'corpus.json')
+
+
+def load_corpus(path=CORPUS_PATH):
+    """Return the corpus entries with their forms validated (normalized) in place."""
+    with open(path) as f:
+        entries = json.load(f)['completions']
+    for entry in entries:
+        error = validate_form(entry['form'])
+        if error:
+            raise ValueError(f"Corpus entry {entry['name']}: {error}")
+    return entries
+
+
+def prompt_index(entries):
+    return {build_prompt(entry['form']): entry['completion'] for entry in entries}
+
+
+def replay_completion(entries):
+    """Return a ``FakeCohere`` completion function that answers from the corpus."""
+    completions = prompt_index(entries)
+    return lambda prompt: completions.get(prompt) or synthesize_completion(prompt)
+
+
+def response_body(prompt, text):
+    return {
+        'id': str(uuid.uuid4()),
+        'generations': [{'id': str(uuid.uuid4()), 'text': text, 'finish_reason': 'COMPLETE'}],
+        'prompt': prompt,
+        'meta': {'billed_units': {'input_tokens': len(prompt) // 4, 'output_tokens': len(text) // 4}}
+    }
+
+
+class ReplayStream:
+    """Mimics the streaming response of ``cohere.Client.generate``."""
+
+    def __init__(self, prompt, text, pause, chunk_size=16):
+        self.prompt = prompt
+        self.text = text
+        self.pause = pause
+        self.chunk_size = chunk_size
+        self.texts = ['']
+        self.generations = None
+
+    def __iter__(self):
+        pieces = [self.text[i:i + self.chunk_size] for i in range(0, len(self.text), self.chunk_size)]
+        for piece in pieces:
+            if self.pause:
+                time.sleep(self.pause / len(pieces))
+            self.texts[0] += piece
+            yield StreamingText(text=piece, is_finished=False, index=0)
+        self.generations = Generations.from_dict(response_body(self.prompt, self.text), return_likelihoods='NONE')
+
+
+class ReplayClient:
+    """Answers ``generate`` calls from the corpus after a modelled delay.
+
+    The delay is ``latency`` plus ``token_latency`` per completion token, at
+    about 4 characters per token.
+    """
+
+    def __init__(self, entries, latency=0.0, token_latency=0.0):
+        self.complete = replay_completion(entries)
+        self.latency = latency
+        self.token_latency = token_latency
+        self.requests = 0
+
+    def generate(self, prompt, stream=False, **params):
+        self.requests += 1
+        text = self.complete(prompt)
+        pause = self.latency + self.token_latency * (len(text) // 4)
+        if stream:
+            return ReplayStream(prompt, text, pause)
+        if pause:
+            time.sleep(pause)
+        return Generations.from_dict(response_body(prompt, text), return_likelihoods='NONE')
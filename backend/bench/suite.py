@@ -0,0 +1,357 @@
+"""Offline benchmark and regression suite for the /generate-plan pipeline.
+
+Everything runs against the corpus replay in ``replay.py``, so no Cohere
+key or network is needed:
+
+    python bench/suite.py
+    python bench/suite.py --output results.json
+    python bench/suite.py --baseline results.json --skip gunicorn
+
+Sections:
+
+``corpus``
+    Parses every corpus completion through the real pipeline. Checks day
+    coverage, fallback days, exercise counts and rest times against the
+    entry's ``expect`` block.
+``stages``
+    Per-request latency of validation, cache key, prompt, parse, fallback
+    fill and serialization, in microseconds.
+``flask``
+    Concurrent requests through the Flask test client, with the
+    in-process replay client.
+``gunicorn``
+    Concurrent requests against a gunicorn server whose CO_API_URL points
+    at a replaying fake Cohere server.
+
+The JSON result has the same shape on every run. With ``--baseline`` the
+suite compares against an earlier result. The exit status is 1 when a
+corpus check fails or a tracked number is more than ``--tolerance`` worse.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# The app only checks that a key is set; every generation goes to the replay client
+os.environ.setdefault('COHERE_API_KEY', 'offline')
+os.environ.setdefault('LOG_SAMPLE_RATE', '0')
+
+from aiohttp import web
+
+import llm
+from app import create_app
+from fake_cohere import FakeCohere
+from fallback import fallback_day
+from loadtest import run as run_http_load
+from plan_cache import cache_key
+from plan_parser import parse_plan
+from planner import build_prompt, finish_plan, plan_response_body, prompt_template, validate_form
+from replay import ReplayClient, load_corpus, replay_completion
+
+SECTIONS = ('corpus', 'stages', 'flask', 'gunicorn')
+FLASK_SCENARIOS = {
+    'generate': '/generate-plan?nocache=1',
+    'generate_cached': '/generate-plan',
+    'stream': '/generate-plan/stream?nocache=1',
+    'per_day': '/generate-plan?nocache=1&mode=per_day'
+}
+
+
+def summarize(values, scale=1.0, digits=3):
+    """Mean and percentiles of ``values``, multiplied by ``scale``."""
+    ordered = sorted(v * scale for v in values)
+
+    def pct(p):
+        return round(ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))], digits)
+
+    return {
+        'mean': round(statistics.mean(ordered), digits),
+        'p50': pct(50),
+        'p90': pct(90),
+        'p99': pct(99),
+        'max': round(ordered[-1], digits)
+    }
+
+
+def observe(entry):
+    """Run one corpus completion through the pipeline and describe what came out."""
+    data = dict(entry['form'])
+    plan = finish_plan(entry['completion'], data)
+    model_days = [day for day in plan['days'] if not day['fallback']]
+    exercises = [exercise for day in model_days for exercise in day['exercises']]
+    return {
+        'days_from_model': len(model_days),
+        'fallback_days': len(plan['days']) - len(model_days),
+        'exercises': len(exercises),
+        'complete_exercises': sum(
+            1 for e in exercises if e['sets'] is not None and e['rest_seconds'] is not None and e['explanation']
+        ),
+        'rest_seconds': [e['rest_seconds'] for e in exercises]
+    }
+
+
+def check_corpus(entries):
+    results = {}
+    failures = []
+    for entry in entries:
+        observed = observe(entry)
+        mismatches = {
+            key: {'expected': expected, 'observed': observed[key]}
+            for key, expected in entry['expect'].items()
+            if observed[key] != expected
+        }
+        results[entry['name']] = {'ok': not mismatches, **{k: observed[k] for k in entry['expect']}}
+        if mismatches:
+            failures.append({'section': 'corpus', 'entry': entry['name'], 'mismatches': mismatches})
+    return results, failures
+
+
+def time_stages(entries, iterations):
+    """Time each pipeline stage per request, replaying the whole corpus ``iterations`` times."""
+    samples = {stage: [] for stage in ('validate', 'cache_key', 'prompt', 'parse', 'fallback_fill', 'serialize')}
+    clock = time.perf_counter
+    for _ in range(iterations):
+        for entry in entries:
+            data = dict(entry['form'])
+            start = clock()
+            validate_form(data)
+            samples['validate'].append(clock() - start)
+
+            start = clock()
+            cache_key(data)
+            samples['cache_key'].append(clock() - start)
+
+            start = clock()
+            build_prompt(data)
+            samples['prompt'].append(clock() - start)
+
+            start = clock()
+            parser = parse_plan(entry['completion'], data['workoutDays'])
+            samples['parse'].append(clock() - start)
+
+            start = clock()
+            for day in parser.missing_days():
+                parser.add_fallback_day(fallback_day(data['workoutDays'], day, data['fitnessLevel']))
+            result = parser.result()
+            samples['fallback_fill'].append(clock() - start)
+
+            start = clock()
+            json.dumps(plan_response_body(result, 'json'))
+            samples['serialize'].append(clock() - start)
+    return {stage: summarize(values, scale=1e6) for stage, values in samples.items()}
+
+
+def run_flask_load(app, path, forms, total, concurrency):
+    local = threading.local()
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def send(i):
+        if not hasattr(local, 'client'):
+            local.client = app.test_client()
+        start = time.perf_counter()
+        response = local.client.post(path, json=forms[i % len(forms)])
+        response.get_data()
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+            statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        list(pool.map(send, range(total)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': total,
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(total / elapsed, 2),
+        'statuses': statuses,
+        'latency_ms': summarize(latencies, scale=1e3)
+    }
+
+
+def bench_flask(entries, args):
+    client = ReplayClient(entries, latency=args.latency, token_latency=args.token_latency)
+    llm.set_client(client)
+    app = create_app()
+    forms = [entry['form'] for entry in entries]
+    results = {}
+    for name, path in FLASK_SCENARIOS.items():
+        if name == 'generate_cached':
+            # Warm the cache so every measured request is a hit
+            run_flask_load(app, '/generate-plan', forms, len(forms), 1)
+        before = client.requests
+        results[name] = run_flask_load(app, path, forms, args.requests, args.concurrency)
+        results[name]['upstream_calls'] = client.requests - before
+    return results
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_fake_cohere(entries, port, latency):
+    """Serve the corpus replay over HTTP from a background thread."""
+    fake = FakeCohere(latency, completion_fn=replay_completion(entries))
+    runner = web.AppRunner(fake.make_app())
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def serve():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(runner.setup())
+        loop.run_until_complete(web.TCPSite(runner, '127.0.0.1', port).start())
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait(10)
+    return fake
+
+
+def wait_until_up(url, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def bench_gunicorn(entries, args):
+    fake_port, app_port = free_port(), free_port()
+    fake = start_fake_cohere(entries, fake_port, args.latency)
+    env = {**os.environ, 'CO_API_URL': f'http://127.0.0.1:{fake_port}', 'LOG_SAMPLE_RATE': '0'}
+    command = [
+        sys.executable, '-m', 'gunicorn', 'app:app',
+        '--bind', f'127.0.0.1:{app_port}',
+        '--workers', str(args.workers),
+        '--worker-class', 'gthread',
+        '--threads', str(args.threads),
+        '--log-level', 'warning'
+    ]
+    try:
+        server = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    except OSError as e:
+        return {'skipped': f'could not start gunicorn: {e}'}
+    try:
+        if not wait_until_up(f'http://127.0.0.1:{app_port}/test'):
+            return {'skipped': 'gunicorn did not come up'}
+        forms = [entry['form'] for entry in entries]
+        summary = asyncio.run(run_http_load(
+            f'http://127.0.0.1:{app_port}/generate-plan?nocache=1', args.requests, args.concurrency, forms, 300
+        ))
+        summary.pop('url')
+        summary.update({'workers': args.workers, 'threads': args.threads, 'upstream_calls': fake.requests})
+        return summary
+    finally:
+        server.terminate()
+        server.wait(10)
+
+
+def tracked_numbers(result):
+    """Flatten the numbers compared against a baseline, with whether higher is better."""
+    numbers = {}
+    for stage, summary in result.get('stages', {}).items():
+        numbers[f'stages.{stage}.p50'] = (summary['p50'], False)
+    for name, summary in result.get('flask', {}).items():
+        numbers[f'flask.{name}.throughput_rps'] = (summary['throughput_rps'], True)
+    if 'throughput_rps' in result.get('gunicorn', {}):
+        numbers['gunicorn.throughput_rps'] = (result['gunicorn']['throughput_rps'], True)
+    return numbers
+
+
+def compare(result, baseline, tolerance):
+    comparison = {}
+    failures = []
+    previous = tracked_numbers(baseline)
+    for name, (value, higher_is_better) in tracked_numbers(result).items():
+        if name not in previous or not previous[name][0]:
+            continue
+        ratio = round(value / previous[name][0], 3)
+        comparison[name] = {'baseline': previous[name][0], 'current': value, 'ratio': ratio}
+        worse = ratio < 1 - tolerance if higher_is_better else ratio > 1 + tolerance
+        if worse:
+            failures.append({'section': 'performance', 'metric': name, **comparison[name]})
+    return comparison, failures
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--skip', nargs='*', default=[], choices=SECTIONS, help='sections to leave out')
+    parser.add_argument('--iterations', type=int, default=200, help='corpus passes for the stage timings')
+    parser.add_argument('--requests', type=int, default=400, help='requests per load scenario')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds the stand-in takes per completion')
+    parser.add_argument('--token-latency', type=float, default=0.0, help='extra stand-in seconds per completion token')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--baseline', help='earlier result file to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='allowed relative slowdown before flagging')
+    parser.add_argument('--output', help='also write the result to this file')
+    args = parser.parse_args()
+
+    entries = load_corpus()
+    result = {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'prompt_template': prompt_template.name,
+            'corpus_entries': len(entries),
+            'params': {k: v for k, v in vars(args).items() if k not in ('baseline', 'output')}
+        }
+    }
+    failures = []
+    if 'corpus' not in args.skip:
+        result['corpus'], corpus_failures = check_corpus(entries)
+        failures.extend(corpus_failures)
+    if 'stages' not in args.skip:
+        result['stages'] = time_stages(entries, args.iterations)
+    if 'flask' not in args.skip:
+        result['flask'] = bench_flask(entries, args)
+    if 'gunicorn' not in args.skip:
+        result['gunicorn'] = bench_gunicorn(entries, args)
+    if args.baseline:
+        with open(args.baseline) as f:
+            result['comparison'], performance_failures = compare(result, json.load(f), args.tolerance)
+        failures.extend(performance_failures)
+    result['regressions'] = failures
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    print(output)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
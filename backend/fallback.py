@@ -0,0 +1,95 @@
+import json
+import os
+
+from plan_parser import render_exercise, split_mapping_for
+
+LIBRARY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fallback_exercises.json')
+DEFAULT_LEVEL = 'beginner'
+
+
+def _load_library(path=LIBRARY_PATH):
+    """Load the default exercise library and pre-render every (split, level) entry.
+
+    Each entry keeps the exercise dicts in the parsed-plan shape plus the
+    exercise lines already rendered as text, so filling a day is a lookup.
+    """
+    with open(path) as f:
+        library = json.load(f)
+
+    index = {}
+    for split, levels in library['splits'].items():
+        for level, exercises in levels.items():
+            parsed = [
+                {
+                    'name': e['name'],
+                    'sets': e['sets'],
+                    'reps': e['reps'],
+                    'rest_seconds': e.get('rest_seconds', library['rest_seconds']),
+                    'details': '',
+                    'explanation': e['explanation']
+                }
+                for e in exercises
+            ]
+            index[(split, level)] = {
+                'exercises': parsed,
+                'text': '\n'.join(render_exercise(e) for e in parsed)
+            }
+    return index
+
+
+FALLBACK_INDEX = _load_library()
+
+
+def fallback_split(workout_days, day):
+    """Return ``(library split, label)`` for a day, following the same rotation the model is given.
+
+    Lower days come from the legs library and Upper days alternate between
+    push and pull, so a filled day matches the split it was planned as.
+    """
+    day_index = workout_days.index(day)
+    rotation = split_mapping_for(workout_days)[1]
+    label = rotation[day_index % len(rotation)]
+    if label == 'Lower':
+        return 'legs', label
+    if label == 'Upper':
+        return ('push' if day_index // 2 % 2 == 0 else 'pull'), label
+    return label.lower(), label
+
+
+def fallback_entry(split, level):
+    # Unknown levels get the beginner library rather than failing the request
+    return FALLBACK_INDEX.get((split, level)) or FALLBACK_INDEX[(split, DEFAULT_LEVEL)]
+
+
+def fallback_day(workout_days, day, level):
+    """Return a parsed-plan day built from the library for a day the model skipped."""
+    split, label = fallback_split(workout_days, day)
+    return {
+        'day': day,
+        'split': label,
+        'fallback': True,
+        'exercises': list(fallback_entry(split, level)['exercises'])
+    }
+
+
+def fallback_plan(data):
+    """Build a whole plan from the library without calling Cohere.
+
+    Returns the parsed plan and its text form, joined from the pre-rendered
+    fragments.
+    """
+    workout_days = data['workoutDays']
+    level = data.get('fitnessLevel', DEFAULT_LEVEL)
+    split_type = split_mapping_for(workout_days)[0]
+    days = [fallback_day(workout_days, day, level) for day in workout_days]
+    text = '\n\n'.join(
+        f"{day['day']} ({day['split']}):\n{fallback_entry(fallback_split(workout_days, day['day'])[0], level)['text']}"
+        for day in days
+    )
+    result = {
+        'focus': f"{split_type} program at the {level} level focusing on {data.get('goals', 'general fitness')}, "
+                 f"built from our standard exercise library.",
+        'split': split_type,
+        'days': days
+    }
+    return result, text
@@ -0,0 +1,134 @@
+import os
+import threading
+import time
+
+import cohere
+import requests
+
+# Seconds a readiness probe result is reused before Cohere is asked again
+READINESS_TTL = float(os.getenv('READINESS_TTL', '60'))
+# Upper bound in seconds on a single Cohere request, retries included
+COHERE_TIMEOUT = float(os.getenv('COHERE_TIMEOUT', '120'))
+# Concurrent connections the async client keeps open to Cohere
+COHERE_POOL_SIZE = int(os.getenv('COHERE_POOL_SIZE', '256'))
+
+_clients = {}
+_client_pid = None
+_override = None
+_client_lock = threading.Lock()
+
+_readiness = {'ready': False, 'error': None, 'checked_at': None, 'refreshing': False}
+_readiness_changed = threading.Condition()
+
+
+def get_client(timeout=None, stream=False):
+    """Return the Cohere client for this process, creating it on first use.
+
+    The client is built lazily so importing the app (and forking gunicorn
+    workers) never touches the network. Clients are keyed on the pid so a
+    worker forked from a parent that already built one gets its own.
+
+    A ``timeout`` gives a separate client whose requests give up after that
+    many seconds without retrying, for callers that fall back rather than wait.
+    The SDK sends ``generate(stream=True)`` requests without any timeout, so
+    ``stream`` gives a client that passes it through ``request_dict``; that
+    client is only for streaming, as other requests would get it twice.
+    """
+    global _clients, _client_pid
+    if _override is not None:
+        return _override
+    pid = os.getpid()
+    name = (timeout, stream)
+    client = _clients.get(name) if _client_pid == pid else None
+    if client is None:
+        with _client_lock:
+            if _client_pid != pid:
+                _clients = {}
+                _client_pid = pid
+            client = _clients.get(name)
+            if client is None:
+                api_key = os.getenv('COHERE_API_KEY')
+                if not api_key:
+                    raise ValueError("COHERE_API_KEY not found in environment variables. Please check your .env file.")
+                # check_api_key=False skips the validation round-trip on construction
+                client = cohere.Client(
+                    api_key,
+                    check_api_key=False,
+                    timeout=timeout or COHERE_TIMEOUT,
+                    max_retries=0 if timeout else 3,
+                    request_dict={'timeout': timeout or COHERE_TIMEOUT} if stream else {}
+                )
+                _clients[name] = client
+    return client
+
+
+def set_client(client):
+    """Use ``client`` in place of every Cohere client for this process, e.g. an offline stand-in."""
+    global _override
+    _override = client
+
+
+def is_timeout(error):
+    """Whether an exception from ``generate`` means the request timed out rather than failed."""
+    timeout_types = (TimeoutError, requests.exceptions.Timeout)
+    return isinstance(error, timeout_types) or isinstance(error.__cause__, timeout_types)
+
+
+def create_async_client():
+    """Build an asyncio Cohere client whose connections are capped at COHERE_POOL_SIZE.
+
+    Its aiohttp session belongs to the running event loop, so the async
+    server creates one on startup and closes it on shutdown.
+    """
+    api_key = os.getenv('COHERE_API_KEY')
+    if not api_key:
+        raise ValueError("COHERE_API_KEY not found in environment variables. Please check your .env file.")
+    return cohere.AsyncClient(
+        api_key,
+        num_workers=COHERE_POOL_SIZE,
+        check_api_key=False,
+        timeout=COHERE_TIMEOUT
+    )
+
+
+def check_readiness(force=False):
+    """Probe Cohere with a tiny completion, caching the result for READINESS_TTL seconds.
+
+    One caller probes at a time, without holding the lock. Callers arriving
+    meanwhile get the previous result, or wait for this one if there is none.
+    """
+    with _readiness_changed:
+        checked_at = _readiness['checked_at']
+        expired = force or checked_at is None or time.monotonic() - checked_at >= READINESS_TTL
+        probe = expired and not _readiness['refreshing']
+        if probe:
+            _readiness['refreshing'] = True
+        else:
+            _readiness_changed.wait_for(lambda: _readiness['checked_at'] is not None)
+            return _readiness_status()
+
+    result = {'ready': False, 'error': 'Readiness check did not finish'}
+    try:
+        get_client().generate(
+            model='command',
+            prompt='Say "test"',
+            max_tokens=5
+        )
+        result = {'ready': True, 'error': None}
+    except Exception as e:
+        print(f"Cohere readiness check failed: {str(e)}")
+        result = {'ready': False, 'error': str(e)}
+    finally:
+        with _readiness_changed:
+            _readiness.update(result, checked_at=time.monotonic(), refreshing=False)
+            _readiness_changed.notify_all()
+            status = _readiness_status()
+    return status
+
+
+def _readiness_status():
+    return {
+        'ready': _readiness['ready'],
+        'error': _readiness['error'],
+        'age': round(time.monotonic() - _readiness['checked_at'], 3)
+    }
@@ -0,0 +1,215 @@
+"""In-process metrics, timing spans and sampled structured request logs.
+
+Counters and histograms are kept per process and rendered in the Prometheus
+text exposition format by ``render_metrics``; scrape every worker (or run a
+single async process) to get the full picture.
+
+Each request gets a log record, held in a context variable, that collects
+its ID, stage timings and outcome. ``finish_request`` emits it as one JSON
+line for a LOG_SAMPLE_RATE fraction of requests and for every server error.
+"""
+import contextvars
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '0.1'))
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TOKEN_BUCKETS = (16, 64, 128, 256, 512, 1024, 1536, 2048, 2500, 4096)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, '')) for name in labelnames)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key)) + (extra or [])
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {value}')
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series['buckets']):
+                    labels = _format_labels(self.labelnames, key, [('le', repr(float(bound)))])
+                    lines.append(f'{self.name}_bucket{labels} {count}')
+                labels = _format_labels(self.labelnames, key, [('le', '+Inf')])
+                lines.append(f'{self.name}_bucket{labels} {series["count"]}')
+                lines.append(f'{self.name}_sum{_format_labels(self.labelnames, key)} {series["sum"]}')
+                lines.append(f'{self.name}_count{_format_labels(self.labelnames, key)} {series["count"]}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, *args, **kwargs):
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, *args, **kwargs):
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUESTS = REGISTRY.counter('plan_requests_total', 'Plan requests by endpoint and outcome', ['endpoint', 'outcome'])
+REQUEST_SECONDS = REGISTRY.histogram('plan_request_seconds', 'End-to-end plan request latency', ['endpoint', 'outcome'])
+STAGE_SECONDS = REGISTRY.histogram('plan_stage_seconds', 'Time spent in each stage of plan generation', ['stage'])
+TOKENS = REGISTRY.histogram('plan_tokens', 'Tokens per Cohere generation', ['kind'], buckets=TOKEN_BUCKETS)
+FALLBACK_DAYS = REGISTRY.counter('plan_fallback_days_total', 'Days filled from the fallback library')
+DAY_FAILURES = REGISTRY.counter('plan_day_failures_total', 'Per-day completions lost to upstream errors or timeouts', ['reason'])
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_request_log = contextvars.ContextVar('request_log', default=None)
+
+request_logger = logging.getLogger('optihealth.requests')
+if not request_logger.handlers:
+    _handler = logging.StreamHandler(sys.stdout)
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    request_logger.addHandler(_handler)
+    request_logger.setLevel(logging.INFO)
+    request_logger.propagate = False
+
+
+def render_metrics():
+    return REGISTRY.render()
+
+
+def start_request(endpoint, request_id=None):
+    """Open the log record for the current request and return its ID."""
+    log = {
+        'request_id': request_id or uuid.uuid4().hex,
+        'endpoint': endpoint,
+        'started_at': time.perf_counter(),
+        'stages': {}
+    }
+    _request_log.set(log)
+    return log['request_id']
+
+
+def annotate(**fields):
+    """Attach fields (outcome, day counts, errors...) to the current request's log record."""
+    log = _request_log.get()
+    if log is not None:
+        log.update(fields)
+
+
+@contextmanager
+def span(stage):
+    """Time a block into plan_stage_seconds and the current request's log record."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        log = _request_log.get()
+        if log is not None:
+            log['stages'][stage] = round(log['stages'].get(stage, 0) + elapsed * 1000, 3)
+
+
+def record_tokens(prompt, completion, meta=None):
+    """Record token counts, from Cohere's billed units when present, else estimated at ~4 characters each."""
+    billed = (meta or {}).get('billed_units') or {}
+    prompt_tokens = billed.get('input_tokens') or len(prompt) // 4
+    completion_tokens = billed.get('output_tokens') or len(completion) // 4
+    TOKENS.observe(prompt_tokens, kind='prompt')
+    TOKENS.observe(completion_tokens, kind='completion')
+    annotate(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+
+
+def current_request():
+    """Return the current request's open log record, or None."""
+    return _request_log.get()
+
+
+def finish_request(status, log=None):
+    """Count the request, close its log record and emit it if sampled.
+
+    Pass ``log`` to close a record after the request's own context is done
+    with it, e.g. once a streamed body has been sent.
+    """
+    if log is None:
+        log = _request_log.get()
+    if log is None or 'started_at' not in log:
+        return
+    if _request_log.get() is log:
+        _request_log.set(None)
+    duration = time.perf_counter() - log.pop('started_at')
+    outcome = log.setdefault('outcome', 'error' if status >= 400 else 'ok')
+    REQUESTS.inc(endpoint=log['endpoint'], outcome=outcome)
+    REQUEST_SECONDS.observe(duration, endpoint=log['endpoint'], outcome=outcome)
+
+    # Streams fail after their 200 has been sent, so upstream errors are always logged too
+    if status >= 500 or outcome == 'upstream_error' or random.random() < LOG_SAMPLE_RATE:
+        log['status'] = status
+        log['duration_ms'] = round(duration * 1000, 3)
+        request_logger.info(json.dumps(log, default=str))
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DAY_ORDER = ['Sun', 'Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat']
+
+
+def sort_days(days):
+    """Return workout days in calendar order, unknown names last."""
+    return sorted(days, key=lambda d: (DAY_ORDER.index(d) if d in DAY_ORDER else len(DAY_ORDER), d))
+
+
+def _hash_text(value):
+    # Free text is whitespace/case normalized and hashed so it never sits in the key verbatim
+    text = ' '.join(str(value or '').split()).casefold()
+    return hashlib.sha256(text.encode('utf-8')).hexdigest() if text else ''
+
+
+def canonical_form(data):
+    """Reduce a /generate-plan payload to the fields that determine the plan."""
+    return {
+        'fitnessLevel': str(data.get('fitnessLevel', '')).strip().casefold(),
+        'goals': str(data.get('goals', '')).strip().casefold(),
+        'workoutDays': sort_days(set(data.get('workoutDays') or [])),
+        'disabilities': _hash_text(data.get('disabilities')),
+        'requirements': _hash_text(data.get('requirements')),
+    }
+
+
+# Bump when the shape of cached values changes so old shared-tier rows are ignored
+CACHE_VERSION = 2
+
+
+def cache_key(data):
+    canonical = json.dumps([CACHE_VERSION, canonical_form(data)], sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class PlanCache:
+    """Two-tier cache for generated plans.
+
+    The first tier is an in-process LRU with a TTL. The optional second tier
+    is a SQLite file shared by every worker on the host; entries found there
+    are promoted into the LRU. Every ``purge_every`` writes, a worker deletes
+    expired rows and, past ``max_rows``, the rows closest to expiring.
+    """
+
+    def __init__(self, max_entries=512, ttl=3600, db_path=None, max_rows=10000, purge_every=64):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self.purge_every = purge_every
+        self._writes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._counters = {'hits': 0, 'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'bypasses': 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            max_entries=int(os.getenv('PLAN_CACHE_SIZE', '512')),
+            ttl=float(os.getenv('PLAN_CACHE_TTL', '3600')),
+            db_path=os.getenv('PLAN_CACHE_DB') or None,
+            max_rows=int(os.getenv('PLAN_CACHE_DB_ROWS', '10000'))
+        )
+
+    def _db(self):
+        # sqlite3 connections cannot be shared across threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS plans ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS plans_expires_at ON plans (expires_at)')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _count(self, *names):
+        with self._lock:
+            for name in names:
+                self._counters[name] += 1
+
+    def get(self, key):
+        value, tier = self._lookup(key)
+        if value is None:
+            self._count('misses')
+        else:
+            self._count('hits', f'{tier}_hits')
+        return value
+
+    def peek(self, key):
+        """Look up a key without touching the hit/miss counters."""
+        return self._lookup(key)[0]
+
+    def _lookup(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._entries.move_to_end(key)
+                    return entry[0], 'memory'
+                del self._entries[key]
+
+        if self.db_path:
+            try:
+                row = self._db().execute(
+                    'SELECT value, expires_at FROM plans WHERE key = ? AND expires_at > ?', (key, now)
+                ).fetchone()
+            except sqlite3.Error as e:
+                print(f"Plan cache read error: {str(e)}")
+                row = None
+            if row is not None:
+                value = json.loads(row[0])
+                self._store(key, value, row[1])
+                return value, 'disk'
+
+        return None, None
+
+    def set(self, key, value):
+        now = time.time()
+        expires_at = now + self.ttl
+        self._store(key, value, expires_at)
+        if self.db_path:
+            with self._lock:
+                self._writes += 1
+                purge = self._writes % self.purge_every == 0
+            try:
+                conn = self._db()
+                conn.execute(
+                    'INSERT OR REPLACE INTO plans (key, value, expires_at) VALUES (?, ?, ?)',
+                    (key, json.dumps(value), expires_at)
+                )
+                if purge:
+                    self._purge(conn, now)
+            except sqlite3.Error as e:
+                print(f"Plan cache write error: {str(e)}")
+
+    def _purge(self, conn, now):
+        # Expired rows are never read again, and free-text keys would otherwise grow the file without limit
+        conn.execute('DELETE FROM plans WHERE expires_at <= ?', (now,))
+        if self.max_rows:
+            conn.execute(
+                'DELETE FROM plans WHERE key IN '
+                '(SELECT key FROM plans ORDER BY expires_at DESC LIMIT -1 OFFSET ?)',
+                (self.max_rows,)
+            )
+
+    def _store(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def record_bypass(self):
+        self._count('bypasses')
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
@@ -0,0 +1,257 @@
+"""Single-pass parser for Cohere workout plan completions.
+
+A parsed plan is a JSON-ready dict::
+
+    {
+        'focus': str,
+        'split': 'Upper/Lower' | 'Push/Pull/Legs',
+        'days': [
+            {
+                'day': 'Mon',
+                'split': 'Upper',
+                'fallback': bool,
+                'exercises': [
+                    {
+                        'name': str,
+                        'sets': int | None,
+                        'reps': str | None,      # '12', '10/leg', '30s'
+                        'rest_seconds': int | None,
+                        'details': str,          # raw text after the name when sets/reps could not be read
+                        'explanation': str
+                    }
+                ]
+            }
+        ]
+    }
+
+``render_plan_text`` turns that back into the text format the frontend
+has always received from /generate-plan.
+"""
+import re
+from functools import lru_cache
+
+EXERCISE_RE = re.compile(
+    r'^(?P<name>[^:]+?)\s*:\s*(?P<sets>\d+)\s*(?:sets?\s*)?[x×]\s*'
+    r'(?P<reps>\d+(?:\s*-\s*\d+)?(?:\s*/\s*(?:leg|side|arm))?(?:\s*(?:s|sec|secs|seconds)\b)?)',
+    re.IGNORECASE
+)
+REST_RE = re.compile(
+    r'\(\s*rest\s*:?\s*(?P<value>\d+)(?:\s*-\s*\d+)?\s*(?P<unit>minutes?|mins?|m|seconds?|secs?|s)?',
+    re.IGNORECASE
+)
+EXPLANATION_RE = re.compile(r'^\[EXPLANATION\]\s*:?\s*', re.IGNORECASE)
+
+
+@lru_cache(maxsize=128)
+def _day_header_re(days):
+    # Longest names first so 'Monday' is preferred over 'Mon' when both are selected
+    alternatives = '|'.join(re.escape(d) for d in sorted(days, key=len, reverse=True))
+    return re.compile(rf'^[*#\s]*({alternatives})', re.IGNORECASE)
+
+
+def split_mapping_for(workout_days):
+    """Return the program split name and the per-day rotation for a schedule."""
+    if len(workout_days) <= 3:
+        return "Upper/Lower", ["Upper", "Lower", "Upper"]
+    return "Push/Pull/Legs", ["Push", "Pull", "Legs"]
+
+
+def parse_exercise(text):
+    """Parse ``Name: 3 x 12 (Rest 90s)`` into an exercise dict, keeping what cannot be read in ``details``."""
+    text = text.strip()
+    exercise = {'name': text, 'sets': None, 'reps': None, 'rest_seconds': None, 'details': '', 'explanation': ''}
+
+    match = EXERCISE_RE.match(text)
+    if match:
+        exercise['name'] = match.group('name').strip()
+        exercise['sets'] = int(match.group('sets'))
+        exercise['reps'] = re.sub(r'\s+', '', match.group('reps'))
+        exercise['reps'] = re.sub(r'(?:secs?|seconds)$', 's', exercise['reps'], flags=re.IGNORECASE)
+    elif ':' in text:
+        name, details = text.split(':', 1)
+        exercise['name'] = name.strip()
+        exercise['details'] = details.strip()
+
+    rest = REST_RE.search(text)
+    if rest:
+        value = int(rest.group('value'))
+        unit = (rest.group('unit') or 's').lower()
+        exercise['rest_seconds'] = value * 60 if unit.startswith('m') else value
+        if not match and exercise['details']:
+            exercise['details'] = exercise['details'][:rest.start() - len(text)].strip()
+
+    if match:
+        # Keep qualifiers after the reps such as 'per side' or '+ 2 drop sets', minus the rest note
+        remainder = text[match.end():]
+        if rest and rest.start() >= match.end():
+            close = text.find(')', rest.end())
+            remainder = text[match.end():rest.start()] + (text[close + 1:] if close != -1 else '')
+        exercise['details'] = ' '.join(remainder.split()).strip(' ,;')
+    return exercise
+
+
+def render_exercise(exercise):
+    if exercise['sets'] is not None:
+        line = f"- {exercise['name']}: {exercise['sets']} x {exercise['reps']}"
+        if exercise['details']:
+            line += f" {exercise['details']}"
+    elif exercise['details']:
+        line = f"- {exercise['name']}: {exercise['details']}"
+    else:
+        line = f"- {exercise['name']}"
+    if exercise['rest_seconds'] is not None:
+        line += f" (Rest {exercise['rest_seconds']}s)"
+    if exercise['explanation']:
+        line += f"\n  [EXPLANATION]: {exercise['explanation']}"
+    return line
+
+
+def render_day(day):
+    return '\n'.join([f"{day['day']} ({day['split']}):"] + [render_exercise(e) for e in day['exercises']])
+
+
+def render_plan_text(plan):
+    """Render a parsed plan in the legacy ``Day (Split):`` / ``- Exercise`` text format."""
+    return '\n\n'.join(render_day(day) for day in plan['days'])
+
+
+class PlanStreamParser:
+    """Incremental, single-pass parser for plan completions.
+
+    Text can be fed in arbitrary chunks as it streams in. Each complete line
+    is handled once: the [FOCUS] block is captured, day headers are matched
+    with one precompiled regex and a dict lookup, and exercise lines (with
+    a ``[EXPLANATION]`` line after them or a ``| explanation`` suffix) are
+    parsed into dicts. ``feed`` and ``close`` return events (focus, day and
+    finished exercises) so callers can forward them immediately; ``result``
+    returns the whole plan.
+    """
+
+    def __init__(self, workout_days):
+        self.workout_days = list(workout_days)
+        self.day_index = {d.lower(): i for i, d in enumerate(self.workout_days)}
+        self.header_re = _day_header_re(tuple(self.workout_days))
+        self.split_type, self.rotation = split_mapping_for(self.workout_days)
+
+        self.days = {}
+        self.current_day = None
+        self.pending = None
+        self.focus_lines = []
+        self.in_focus = False
+        self.focus_sent = False
+        self._buffer = ""
+
+    def feed(self, text):
+        """Consume a chunk of completion text and return events for each finished line."""
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split('\n')
+        events = []
+        for line in lines:
+            self._parse_line(line, events)
+        return events
+
+    def close(self):
+        """Flush the trailing partial line, the last exercise and any unclosed focus text."""
+        events = []
+        if self._buffer:
+            self._parse_line(self._buffer, events)
+            self._buffer = ""
+        self._flush(events)
+        if not self.focus_sent and self.focus:
+            events.append(self._focus_event())
+        return events
+
+    @property
+    def focus(self):
+        return '\n'.join(self.focus_lines).strip()
+
+    def _focus_event(self):
+        self.focus_sent = True
+        return {'type': 'focus', 'text': self.focus}
+
+    def _flush(self, events):
+        if self.pending is not None:
+            events.append({'type': 'exercise', 'day': self.current_day['day'], 'exercise': self.pending})
+            self.pending = None
+
+    def _parse_line(self, line, events):
+        # The [FOCUS] section is pulled out wherever it appears, on one line or several
+        if not self.in_focus and "[FOCUS]" in line:
+            self.in_focus = True
+            line = line.split("[FOCUS]", 1)[1]
+        if self.in_focus:
+            if "[/FOCUS]" in line:
+                self.in_focus = False
+                self.focus_lines.append(line.split("[/FOCUS]", 1)[0])
+                events.append(self._focus_event())
+                return
+            if not self.header_re.match(line):
+                self.focus_lines.append(line)
+                return
+            # A day header ends a focus block the model never closed
+            self.in_focus = False
+            events.append(self._focus_event())
+
+        line = line.strip()
+        if not line:
+            return
+
+        header = self.header_re.match(line)
+        if header:
+            self._flush(events)
+            day = self.workout_days[self.day_index[header.group(1).lower()]]
+            self._start_day(day, events)
+        elif self.current_day is None:
+            # Preamble before the first day has nowhere to go
+            return
+        elif EXPLANATION_RE.match(line):
+            if self.pending is not None:
+                self.pending['explanation'] = EXPLANATION_RE.sub('', line, count=1).strip()
+                self._flush(events)
+        else:
+            self._flush(events)
+            # The compact grammar puts the explanation on the exercise line after a '|'
+            line, _, explanation = line.partition('|')
+            self.pending = parse_exercise(line.lstrip('-*• ').strip())
+            self.current_day['exercises'].append(self.pending)
+            if explanation.strip():
+                self.pending['explanation'] = explanation.strip()
+                self._flush(events)
+
+    def _start_day(self, day, events):
+        # A day mentioned twice keeps collecting into the same entry
+        if day not in self.days:
+            split = self.rotation[self.day_index[day.lower()] % len(self.rotation)]
+            self.days[day] = {'day': day, 'split': split, 'fallback': False, 'exercises': []}
+            events.append({'type': 'day', 'day': day, 'split': split, 'fallback': False})
+        self.current_day = self.days[day]
+
+    def missing_days(self):
+        """Days the model skipped, or gave a header with no exercises under it."""
+        return [day for day in self.workout_days if day not in self.days or not self.days[day]['exercises']]
+
+    def add_fallback_day(self, day_plan):
+        """Add a prepared block for a missing day, replacing any empty entry, and return its events."""
+        events = []
+        self._flush(events)
+        day = day_plan['day']
+        self.days[day] = self.current_day = day_plan
+        events.append({'type': 'day', 'day': day, 'split': day_plan['split'], 'fallback': True})
+        for exercise in day_plan['exercises']:
+            events.append({'type': 'exercise', 'day': day, 'exercise': exercise})
+        return events
+
+    def result(self):
+        return {
+            'focus': self.focus,
+            'split': self.split_type,
+            'days': [self.days[d] for d in self.workout_days if d in self.days]
+        }
+
+
+def parse_plan(text, workout_days):
+    """Parse a complete plan completion in one pass."""
+    parser = PlanStreamParser(workout_days)
+    parser.feed(text)
+    parser.close()
+    return parser
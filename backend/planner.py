@@ -0,0 +1,330 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from fallback import fallback_day, fallback_plan
+from llm import get_client, is_timeout
+from metrics import DAY_FAILURES, FALLBACK_DAYS, annotate, record_tokens, span
+from plan_cache import DAY_ORDER, PlanCache, cache_key, sort_days
+from plan_parser import parse_plan, render_plan_text, split_mapping_for
+from prompts import DAY, FOCUS, get_template
+from singleflight import SingleFlight
+
+# Generated plans keyed on the canonicalized form; PLAN_CACHE_DB enables the shared tier
+plan_cache = PlanCache.from_env()
+# Coalesces concurrent generations of the same key; PLAN_LOCK_DIR extends this across workers
+# using PLAN_LOCK_STRIPES lock files
+plan_flight = SingleFlight(
+    lock_dir=os.getenv('PLAN_LOCK_DIR') or None,
+    lock_stripes=int(os.getenv('PLAN_LOCK_STRIPES', '256'))
+)
+
+# Static instructions and completion budget; PROMPT_TEMPLATE selects verbose or compact
+prompt_template = get_template()
+
+# Generation parameters shared by every serving path; max_tokens is set per request by generation_params
+GENERATION_PARAMS = {
+    'model': 'command',
+    'temperature': 0.7,  # Increased for more creative responses
+    'k': 0,
+    'stop_sequences': ["\n\n\n"],
+    'return_likelihoods': 'NONE'
+}
+
+# Degraded mode: FALLBACK_ONLY serves every plan from the fallback library, and
+# LLM_MAX_IN_FLIGHT (0 = unlimited) sheds new generations to it once that many are running
+FALLBACK_ONLY = os.getenv('FALLBACK_ONLY', '').lower() in ('1', 'true', 'yes')
+LLM_MAX_IN_FLIGHT = int(os.getenv('LLM_MAX_IN_FLIGHT', '0'))
+
+# Per-day mode: GENERATION_MODE=per_day (or ?mode=per_day) requests every day in its own
+# completion at once; days not back within DAY_TIMEOUT seconds come from the fallback library
+GENERATION_MODE = os.getenv('GENERATION_MODE', 'single').lower()
+DAY_TIMEOUT = float(os.getenv('DAY_TIMEOUT', '30'))
+
+def build_prompt(data):
+    return prompt_template.render(data)
+
+def generation_params(data):
+    """Cohere parameters for a validated form, with max_tokens sized to its days."""
+    return {**GENERATION_PARAMS, 'max_tokens': prompt_template.max_tokens(len(data['workoutDays']))}
+
+def build_plan(data):
+    """Prompt Cohere for the plan described by a validated form and format the result."""
+    # Create prompt for Cohere - optimized for faster response
+    with span('prompt'):
+        prompt = build_prompt(data)
+
+    # Generate response using Cohere with optimized parameters
+    with span('upstream'):
+        co = get_client()
+        response = co.generate(prompt=prompt, **generation_params(data))
+
+    plan = response.generations[0].text.strip()
+    record_tokens(prompt, plan, response.meta)
+    return finish_plan(plan, data)
+
+def use_per_day(mode=''):
+    """Decide whether a plan is generated one day per completion rather than in a single completion."""
+    return (mode or GENERATION_MODE).lower().replace('-', '_') == 'per_day'
+
+def day_requests(data):
+    """Return the per-day prompts as ``{day: (prompt, params)}`` plus the focus request.
+
+    The skeleton (which split each day gets) is worked out locally, so every
+    completion only has to fill in one session.
+    """
+    rotation = split_mapping_for(data['workoutDays'])[1]
+    day_params = {**GENERATION_PARAMS, 'max_tokens': DAY.max_tokens(1)}
+    days = {
+        day: (DAY.render(data, day=day, split=rotation[i % len(rotation)]), day_params)
+        for i, day in enumerate(data['workoutDays'])
+    }
+    focus = (FOCUS.render(data), {**GENERATION_PARAMS, 'max_tokens': FOCUS.max_tokens(0)})
+    return days, focus
+
+def completion_text(prompt, response):
+    text = response.generations[0].text.strip()
+    record_tokens(prompt, text, response.meta)
+    return text
+
+def build_plan_per_day(data):
+    """Generate every day concurrently and assemble whatever is back within DAY_TIMEOUT.
+
+    Returns ``(result, complete)`` like ``finish_per_day``.
+    """
+    with span('prompt'):
+        days, (focus_prompt, focus_params) = day_requests(data)
+
+    with span('upstream'):
+        co = get_client(timeout=DAY_TIMEOUT)
+        # Each plan gets its own threads so no call spends its DAY_TIMEOUT queued behind another plan's
+        executor = ThreadPoolExecutor(len(days) + 1, thread_name_prefix='plan-day')
+        futures = {executor.submit(co.generate, prompt=prompt, **params): day for day, (prompt, params) in days.items()}
+        focus_future = executor.submit(co.generate, prompt=focus_prompt, **focus_params)
+        done, _ = wait([*futures, focus_future], timeout=DAY_TIMEOUT)
+        # Calls still running cannot be cancelled; the client's DAY_TIMEOUT ends them once they stall
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    responses = {day: future.exception() or future.result() for future, day in futures.items() if future in done}
+    focus_response = None
+    if focus_future in done and focus_future.exception() is None:
+        focus_response = focus_future.result()
+    return finish_per_day(data, days, focus_prompt, responses, focus_response)
+
+def finish_per_day(data, days, focus_prompt, responses, focus_response=None):
+    """Assemble a per-day plan from ``{day: response or exception}``; days absent from ``responses`` timed out.
+
+    Returns ``(result, complete)``, where ``complete`` is False if any day was
+    lost to an upstream error or timeout. Raises when no day came back at all.
+    """
+    errors = {day: r for day, r in responses.items() if isinstance(r, Exception)}
+    timeouts = [day for day in days if day not in responses or (day in errors and is_timeout(errors[day]))]
+    failures = [day for day, error in errors.items() if not is_timeout(error)]
+    DAY_FAILURES.inc(len(timeouts), reason='timeout')
+    DAY_FAILURES.inc(len(failures), reason='error')
+    annotate(day_timeouts=len(timeouts), day_errors=len(failures))
+    if failures:
+        annotate(day_error=str(errors[failures[0]]))
+
+    completions = {day: completion_text(days[day][0], r) for day, r in responses.items() if day not in errors}
+    if not completions:
+        if failures:
+            raise errors[failures[0]]
+        raise TimeoutError(f'no day was generated within {DAY_TIMEOUT:g}s')
+
+    focus = completion_text(focus_prompt, focus_response) if focus_response is not None else None
+    return assemble_plan(data, completions, focus), not (timeouts or failures)
+
+def assemble_plan(data, completions, focus_completion=None):
+    """Build a plan from per-day completions in schedule order, filling missing or unreadable days from the fallback library."""
+    workout_days = data['workoutDays']
+    split_type = split_mapping_for(workout_days)[0]
+    days = []
+    missing = 0
+    with span('parse'):
+        for day in workout_days:
+            parsed = None
+            if completions.get(day):
+                # Sessions come back without a header; supply it so the parser files the lines under this day
+                parsed = parse_plan(f"{day}:\n{completions[day]}", workout_days).days.get(day)
+            if not parsed or not parsed['exercises']:
+                parsed = fallback_day(workout_days, day, data['fitnessLevel'])
+                missing += 1
+            days.append(parsed)
+        focus = (focus_completion or '').strip()
+        if '[FOCUS]' in focus:
+            focus = parse_plan(focus, workout_days).focus
+
+    if missing:
+        FALLBACK_DAYS.inc(missing)
+    annotate(fallback_days=missing)
+    return {
+        'focus': focus or f"{split_type} program at the {data['fitnessLevel']} level focusing on {data['goals']}.",
+        'split': split_type,
+        'days': days
+    }
+
+def finish_plan(completion, data):
+    """Parse a completion and fill any day the model skipped from the fallback library."""
+    # Parse the response into days and exercises in a single pass
+    with span('parse'):
+        parser = parse_plan(completion, data['workoutDays'])
+
+    # Ensure each selected day has at least one exercise
+    with span('fallback_fill'):
+        missing = parser.missing_days()
+        for day in missing:
+            parser.add_fallback_day(fallback_day(data['workoutDays'], day, data['fitnessLevel']))
+    if missing:
+        FALLBACK_DAYS.inc(len(missing))
+    annotate(fallback_days=len(missing))
+
+    return parser.result()
+
+def plan_response_body(result, response_format, text=None):
+    """Shape a parsed plan for the client: structured JSON on request, legacy text otherwise."""
+    if text is None:
+        text = render_plan_text(result)
+    if response_format == 'json':
+        return {**result, 'plan': text}
+    return {
+        'plan': text,
+        'focus': result['focus']
+    }
+
+def use_fallback_only(key, mode='', flight=None):
+    """Decide whether this request should skip Cohere and be served from the fallback library.
+
+    ``flight`` is whatever runs this server's generations (``plan_flight`` by
+    default); it needs ``is_in_flight(key)`` and an ``in_flight`` count in ``stats()``.
+    """
+    if FALLBACK_ONLY or mode.lower() == 'fallback':
+        return True
+    flight = flight or plan_flight
+    # Joining a generation that is already running costs nothing upstream
+    if LLM_MAX_IN_FLIGHT and not flight.is_in_flight(key):
+        return flight.stats()['in_flight'] >= LLM_MAX_IN_FLIGHT
+    return False
+
+def validate_form(data):
+    """Check a plan request in place and return an error message, or None if it is usable."""
+    if not isinstance(data, dict):
+        return 'Request body must be a JSON object'
+
+    # Validate required fields
+    required_fields = ['fitnessLevel', 'goals', 'workoutDays']
+    for field in required_fields:
+        if not data.get(field):
+            return f'Missing required field: {field}'
+
+    # Check types before normalizing; a bare string of days would otherwise be split into letters
+    for field in ('fitnessLevel', 'goals'):
+        if not isinstance(data[field], str):
+            return f'{field} must be a string'
+    if not isinstance(data['workoutDays'], list) or not all(isinstance(d, str) for d in data['workoutDays']):
+        return 'workoutDays must be a list of day names'
+    workout_days = {d.strip().title() for d in data['workoutDays']}
+    unknown = sorted(workout_days - set(DAY_ORDER))
+    if unknown:
+        return f"Unknown workout day: {unknown[0]!r} (expected one of {', '.join(DAY_ORDER)})"
+
+    # Normalize the fields the cache key is built from so equivalent forms produce the same plan
+    data['fitnessLevel'] = data['fitnessLevel'].strip().casefold()
+    data['goals'] = data['goals'].strip().casefold()
+    data['workoutDays'] = sort_days(workout_days)
+    return None
+
+def generate_and_cache(key, data, mode=''):
+    if use_per_day(mode):
+        result, complete = build_plan_per_day(data)
+    else:
+        result, complete = build_plan(data), True
+    # Like fallback-only plans, plans with days lost to upstream errors are degraded and not cached
+    if complete:
+        plan_cache.set(key, result)
+    return result
+
+class PlanRequest:
+    """The /generate-plan flow shared by the Flask and asyncio servers and the stream endpoint.
+
+    Only running the generation differs between them. ``prepare`` answers
+    the request without Cohere when it can; otherwise the server generates the
+    plan for ``key`` and replies with ``generated`` or ``failed``. Every reply
+    is ``(body, status, headers)``. The stream endpoint calls ``validate`` and
+    ``ready_plan`` itself, since it replays a ready plan as events.
+    """
+
+    def __init__(self, data, args):
+        self.data = data
+        # ?format=json serves the parsed days directly instead of only the text blob
+        self.response_format = args.get('format', 'text').lower()
+        self.bypass_cache = args.get('nocache', '').lower() in ('1', 'true', 'yes')
+        self.mode = args.get('mode', '')
+        self.key = None
+
+    def prepare(self, flight=None):
+        """Return the reply for an invalid form, a cache hit or a fallback plan, or None if a generation is needed."""
+        reply = self.validate()
+        if reply is not None:
+            return reply
+        result, text, source = self.ready_plan(flight)
+        if result is None:
+            return None
+        with span('serialize'):
+            return plan_response_body(result, self.response_format, text), 200, self.headers(source)
+
+    def validate(self):
+        """Validate the form and set ``key``; return the 400 reply if the form is unusable."""
+        with span('validate'):
+            error = validate_form(self.data)
+        if error:
+            annotate(outcome='invalid', error=error)
+            return {'error': error}, 400, {}
+        annotate(days=len(self.data['workoutDays']))
+        self.key = cache_key(self.data)
+        return None
+
+    def ready_plan(self, flight=None):
+        """Return ``(result, text, source)`` for a plan that needs no generation, or Nones.
+
+        ``source`` is ``'cache'`` or ``'fallback'``; ``text`` is only set for fallback plans.
+        """
+        # Serve repeated form combinations from the cache unless the caller opts out
+        if self.bypass_cache:
+            plan_cache.record_bypass()
+        else:
+            with span('cache_lookup'):
+                cached = plan_cache.get(self.key)
+            if cached is not None:
+                annotate(outcome='cache_hit')
+                return cached, None, 'cache'
+
+        # Degraded plans are not cached so a real generation replaces them later
+        if use_fallback_only(self.key, self.mode, flight):
+            annotate(outcome='fallback_only')
+            result, text = fallback_plan(self.data)
+            return result, text, 'fallback'
+        return None, None, None
+
+    def headers(self, source=None, shared=False):
+        """Response headers for a plan from ``source`` (see ``ready_plan``), or a generated one."""
+        if source == 'cache':
+            return {'X-Plan-Cache': 'hit'}
+        if source == 'fallback':
+            return {'X-Plan-Source': 'fallback'}
+        headers = {'X-Plan-Cache': 'bypass' if self.bypass_cache else 'miss'}
+        if shared:
+            headers['X-Plan-Coalesced'] = '1'
+        return headers
+
+    def generated(self, result, shared):
+        annotate(outcome='coalesced' if shared else 'generated')
+        with span('serialize'):
+            return plan_response_body(result, self.response_format), 200, self.headers(shared=shared)
+
+    def failed(self, error):
+        # A single completion times out as a CohereError caused by requests.Timeout, per-day mode as TimeoutError
+        if is_timeout(error):
+            annotate(outcome='timeout')
+            return {'error': 'Cohere API error: request timed out'}, 504, {}
+        annotate(outcome='upstream_error', error=str(error))
+        return {'error': f'Cohere API error: {str(error)}'}, 500, {}
@@ -0,0 +1,166 @@
+"""Prompt templates for plan generation.
+
+A template is split into a static instruction block, built once at import,
+and small per-request parts that only carry the form fields. It also sizes
+the completion: ``max_tokens`` is budgeted from the number of selected days
+and the template's exercises per day, instead of a flat 2500.
+
+Two templates ship:
+
+``verbose``
+    The original prompt, with a two-day example and two-line exercises.
+``compact``
+    A short grammar with one line per exercise (``- Name: 3 x 12 (Rest 90s) | cue``),
+    a one-line focus and the day splits worked out locally. It has far fewer
+    tokens in both directions.
+
+PROMPT_TEMPLATE picks the template (default ``compact``). Per-day generation
+uses ``DAY`` for each session and ``FOCUS`` for the program focus instead.
+"""
+import os
+
+from plan_parser import split_mapping_for
+
+# Ceiling on any completion, whatever the budget works out to
+MAX_TOKENS_CAP = 2500
+
+
+class PromptTemplate:
+    def __init__(self, name, header, instructions, footer, focus_tokens, day_tokens, exercise_tokens,
+                 max_exercises=5, headroom=1.25):
+        self.name = name
+        self.header = header
+        self.instructions = instructions
+        self.footer = footer
+        self.focus_tokens = focus_tokens
+        self.day_tokens = day_tokens
+        self.exercise_tokens = exercise_tokens
+        self.max_exercises = max_exercises
+        self.headroom = headroom
+
+    def render(self, data, **extra):
+        """Build the prompt for a validated form; ``extra`` fills template fields beyond the form's."""
+        fields = {**request_fields(data), **extra}
+        return '\n'.join([self.header.format(**fields), self.instructions, self.footer.format(**fields)])
+
+    def max_tokens(self, day_count):
+        """Completion budget for a plan of ``day_count`` days, with headroom for longer answers."""
+        budget = self.focus_tokens + day_count * (self.day_tokens + self.max_exercises * self.exercise_tokens)
+        return min(MAX_TOKENS_CAP, int(budget * self.headroom))
+
+
+def request_fields(data):
+    workout_days = data['workoutDays']
+    split_type, rotation = split_mapping_for(workout_days)
+    return {
+        'split_type': split_type,
+        'level': data['fitnessLevel'],
+        'goals': data['goals'],
+        'days': ', '.join(workout_days),
+        'day_splits': ', '.join(f'{day} ({rotation[i % len(rotation)]})' for i, day in enumerate(workout_days)),
+        'accommodations': f'Accommodate for: {data["disabilities"]}.' if data.get('disabilities') else '',
+        'requirements': f'Additional requirements: {data["requirements"]}.' if data.get('requirements') else ''
+    }
+
+
+VERBOSE = PromptTemplate(
+    'verbose',
+    header="""Create a comprehensive split-based workout plan for a {level} level person focusing on {goals}, training on these days: {days}.
+{accommodations}
+{requirements}
+""",
+    instructions="""[FOCUS]
+Brief program focus explaining the split routine structure and its effectiveness for the user's goals.
+[/FOCUS]
+
+Organize the workouts in a Push/Pull/Legs split or Upper/Lower split based on the number of workout days.
+For each day, provide 3-5 exercises that target the day's muscle groups, using this format:
+[Day]:
+- [Exercise]: [Sets] x [Reps] (Rest [Time])
+  [EXPLANATION]: Brief explanation of form, safety, and muscle engagement
+
+Example:
+(Mon (Push):
+ - Incline Push-ups: 3 x 12 (Rest 90s)
+  [EXPLANATION]: Keep core tight, hands shoulder-width, focus on chest engagement
+ - Shoulder Press: 3 x 10 (Rest 90s)
+  [EXPLANATION]: Stand or sit with back straight, press directly overhead
+ - Diamond Push-ups: 3 x 8 (Rest 90s)
+  [EXPLANATION]: Hands close together, elbows tucked for tricep focus
+ - Lateral Raises: 3 x 12 (Rest 60s)
+  [EXPLANATION]: Slight bend in elbows, controlled movement
+
+Wed (Pull):
+ - Inverted Rows: 3 x 10 (Rest 90s)
+  [EXPLANATION]: Use table or bar, keep body straight, squeeze shoulder blades
+ - Face Pulls: 3 x 15 (Rest 60s)
+  [EXPLANATION]: Pull toward face level, focus on rear deltoids
+ - Chin-ups or Band Pull-downs: 3 x 8 (Rest 90s)
+  [EXPLANATION]: Focus on lat engagement, controlled negative
+ - Reverse Flyes: 3 x 12 (Rest 60s)
+  [EXPLANATION]: Bend forward, keep back straight, squeeze shoulder blades)
+""",
+    footer="""IMPORTANT:
+- Provide exercises for ALL of these days: {days}
+- Each day should focus on specific muscle groups following the split pattern
+- Include 3-5 exercises per day with proper progression
+- Adjust exercise difficulty based on the {level} fitness level""",
+    focus_tokens=120,
+    day_tokens=8,
+    exercise_tokens=40
+)
+
+COMPACT = PromptTemplate(
+    'compact',
+    header="""Workout plan for a {level} level person focusing on {goals}, training on these days: {days}.
+{accommodations}
+{requirements}""",
+    instructions="""Reply in exactly this format and nothing else:
+[FOCUS] One sentence on why this split suits the goal. [/FOCUS]
+Mon (Push):
+- Incline Push-ups: 3 x 12 (Rest 90s) | Core tight, elbows at 45 degrees
+- Lateral Raises: 3 x 12 (Rest 60s) | Slight elbow bend, slow lowering
+""",
+    footer="""Days: {day_splits}.
+Give 3-5 exercises per day for the day's muscle groups, suited to the {level} level, with a form cue under 8 words.""",
+    focus_tokens=40,
+    day_tokens=6,
+    exercise_tokens=24
+)
+
+TEMPLATES = {template.name: template for template in (VERBOSE, COMPACT)}
+
+# Per-day generation asks for each session and the program focus separately
+DAY = PromptTemplate(
+    'day',
+    header="""Workout session for a {level} level person focusing on {goals}. Session: {day} ({split}).
+{accommodations}
+{requirements}""",
+    instructions="""Reply with only the exercise lines, in exactly this format:
+- Incline Push-ups: 3 x 12 (Rest 90s) | Core tight, elbows at 45 degrees
+- Lateral Raises: 3 x 12 (Rest 60s) | Slight elbow bend, slow lowering
+""",
+    footer="""Give 3-5 exercises for {day}'s {split} muscle groups, suited to the {level} level, with a form cue under 8 words.""",
+    focus_tokens=0,
+    day_tokens=6,
+    exercise_tokens=24
+)
+
+FOCUS = PromptTemplate(
+    'focus',
+    header="""A {level} level person focusing on {goals} trains on {day_splits} in a {split_type} split.""",
+    instructions="""Reply in exactly this format and nothing else:
+[FOCUS] One sentence on why this split suits the goal. [/FOCUS]""",
+    footer='',
+    focus_tokens=60,
+    day_tokens=0,
+    exercise_tokens=0
+)
+
+
+def get_template(name=None):
+    """Return the named template, or the one selected by PROMPT_TEMPLATE."""
+    name = (name or os.getenv('PROMPT_TEMPLATE') or COMPACT.name).lower()
+    if name not in TEMPLATES:
+        raise ValueError(f"Unknown prompt template '{name}'. Choose one of: {', '.join(TEMPLATES)}")
+    return TEMPLATES[name]
@@ -0,0 +1,111 @@
+import fcntl
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run at most one call per key at a time and share its outcome.
+
+    Threads asking for a key that is already in flight block until the
+    leader finishes and receive the same result (or exception). With a
+    lock_dir, leaders in different processes also serialize on a lock file;
+    a leader that had to wait for the lock calls ``recheck`` first so it can
+    pick up what the other process just produced. Keys are hashed onto a
+    fixed set of ``lock_stripes`` files, so the directory does not grow with
+    the number of distinct keys; keys sharing a stripe merely take turns.
+    """
+
+    def __init__(self, lock_dir=None, lock_stripes=256):
+        self.lock_dir = lock_dir
+        self.lock_stripes = lock_stripes
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._counters = {'leaders': 0, 'coalesced': 0, 'cross_process_coalesced': 0, 'in_flight': 0}
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, key, fn, recheck=None):
+        """Return ``(result, shared)`` where shared is True if another caller did the work."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self._counters['coalesced'] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self._counters['leaders'] += 1
+                self._counters['in_flight'] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        shared = False
+        try:
+            if self.lock_dir:
+                call.result, shared = self._run_locked(key, fn, recheck)
+            else:
+                call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+                self._counters['in_flight'] -= 1
+                if shared:
+                    self._counters['cross_process_coalesced'] += 1
+            call.done.set()
+        return call.result, shared
+
+    def _run_locked(self, key, fn, recheck):
+        stripe = zlib.crc32(str(key).encode('utf-8')) % self.lock_stripes
+        path = os.path.join(self.lock_dir, f'stripe-{stripe}.lock')
+        with open(path, 'w') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                contended = False
+            except BlockingIOError:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                contended = True
+            try:
+                if contended and recheck is not None:
+                    result = recheck()
+                    if result is not None:
+                        return result, True
+                return fn(), False
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def running(self):
+        """Count work that cannot be shared, such as a streamed generation, as in flight while it runs."""
+        with self._lock:
+            self._counters['in_flight'] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._counters['in_flight'] -= 1
+
+    def is_in_flight(self, key):
+        with self._lock:
+            return key in self._calls
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters)
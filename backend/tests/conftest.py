@@ -0,0 +1,80 @@
+"""Shared fixtures: every test runs offline against the corpus replay client.
+
+Run from the repository root or ``backend``:
+
+    python -m pytest backend/tests
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'bench'))
+
+# The app only checks that a key is set; every generation goes to the replay client
+os.environ.setdefault('COHERE_API_KEY', 'offline')
+os.environ.setdefault('LOG_SAMPLE_RATE', '0')
+
+import pytest
+
+import llm
+import planner
+from replay import ReplayClient, load_corpus
+
+
+class ScriptedClient:
+    """Wraps a replay client and raises ``error`` for every prompt ``fails`` accepts."""
+
+    def __init__(self, inner, fails, error):
+        self.inner = inner
+        self.fails = fails
+        self.error = error
+        self.requests = 0
+
+    def generate(self, prompt, **params):
+        self.requests += 1
+        if self.fails(prompt):
+            raise self.error
+        return self.inner.generate(prompt, **params)
+
+
+@pytest.fixture
+def corpus():
+    return load_corpus()
+
+
+@pytest.fixture
+def replay(corpus):
+    client = ReplayClient(corpus)
+    llm.set_client(client)
+    yield client
+    llm.set_client(None)
+
+
+@pytest.fixture
+def scripted(replay):
+    """Install a ``ScriptedClient`` around the replay client: ``scripted(fails, error)``."""
+    def install(fails, error):
+        client = ScriptedClient(replay, fails, error)
+        llm.set_client(client)
+        return client
+    return install
+
+
+@pytest.fixture(autouse=True)
+def empty_plan_cache():
+    # The cache is per process, so clear what earlier tests stored
+    planner.plan_cache._entries.clear()
+    yield
+    planner.plan_cache._entries.clear()
+
+
+@pytest.fixture
+def client(replay):
+    from app import create_app
+    return create_app().test_client()
+
+
+@pytest.fixture
+def form():
+    return {'fitnessLevel': 'Beginner', 'goals': 'strength', 'workoutDays': ['Fri', 'Mon', 'Wed']}
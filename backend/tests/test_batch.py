@@ -0,0 +1,42 @@
+from cohere.error import CohereError
+
+from batch import run_batch
+
+
+def by_index(results):
+    return {item['index']: item for item in results}
+
+
+def test_identical_forms_are_generated_once(replay, form):
+    forms = [form, {**form, 'workoutDays': ['mon', 'wed', 'fri']}, {**form, 'goals': 'endurance'}]
+    results = by_index(run_batch(forms, 'json'))
+
+    assert [results[i]['status'] for i in range(3)] == [200, 200, 200]
+    assert sorted(results[i]['deduplicated'] for i in (0, 1)) == [False, True]
+    assert results[0]['plan'] == results[1]['plan']
+    assert replay.requests == 2
+
+    # A second batch is answered from the cache
+    again = by_index(run_batch(forms[:1]))
+    assert again[0]['cache'] == 'hit'
+    assert replay.requests == 2
+
+
+def test_bad_items_fail_alone(replay, form):
+    forms = [form, None, {**form, 'workoutDays': 'Mon'}, {**form, 'workoutDays': ['Mon', '']}, {'goals': 'x'}]
+    results = by_index(run_batch(forms))
+
+    assert results[0]['status'] == 200
+    for index in range(1, 5):
+        assert results[index]['status'] == 400, results[index]
+        assert results[index]['error']
+
+
+def test_upstream_errors_are_reported_per_item(scripted, form):
+    other = {**form, 'goals': 'endurance'}
+    scripted(lambda prompt: 'endurance' in prompt, CohereError('upstream unavailable'))
+    results = by_index(run_batch([form, other, other]))
+
+    assert results[0]['status'] == 200
+    assert results[1]['status'] == results[2]['status'] == 500
+    assert 'upstream unavailable' in results[1]['error']
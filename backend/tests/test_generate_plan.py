@@ -0,0 +1,79 @@
+import requests
+from cohere.error import CohereError
+
+
+def test_repeated_form_is_served_from_cache(client, replay, form):
+    first = client.post('/generate-plan', json=form)
+    assert first.status_code == 200
+    assert first.headers['X-Plan-Cache'] == 'miss'
+
+    # Equivalent after normalization: case, order and duplicates do not matter
+    again = client.post('/generate-plan', json={**form, 'fitnessLevel': ' BEGINNER', 'workoutDays': ['wed', 'Mon', 'Fri', 'fri']})
+    assert again.status_code == 200
+    assert again.headers['X-Plan-Cache'] == 'hit'
+    assert again.json == first.json
+    assert replay.requests == 1
+
+
+def test_nocache_bypasses_the_cache(client, replay, form):
+    client.post('/generate-plan', json=form)
+    bypass = client.post('/generate-plan?nocache=1', json=form)
+    assert bypass.status_code == 200
+    assert bypass.headers['X-Plan-Cache'] == 'bypass'
+    assert replay.requests == 2
+
+
+def test_fallback_mode_is_not_cached(client, replay, form):
+    fallback = client.post('/generate-plan?mode=fallback', json=form)
+    assert fallback.headers['X-Plan-Source'] == 'fallback'
+    assert client.post('/generate-plan', json=form).headers['X-Plan-Cache'] == 'miss'
+    assert replay.requests == 1
+
+
+def test_invalid_forms_get_400(client, replay, form):
+    for body in (
+        {**form, 'workoutDays': ['Mon', '']},
+        {**form, 'workoutDays': ['Funday']},
+        {**form, 'workoutDays': 'Mon'},
+        {**form, 'goals': ['strength']},
+        {'goals': 'strength'},
+        [form],
+    ):
+        response = client.post('/generate-plan', json=body)
+        assert response.status_code == 400, body
+        assert 'error' in response.json
+    assert replay.requests == 0
+
+
+def test_malformed_json_gets_400(client):
+    for path in ('/generate-plan', '/generate-plan/stream'):
+        response = client.post(path, data='{"goals":', content_type='application/json')
+        assert response.status_code == 400
+        assert response.json == {'error': 'Request body must be a JSON object'}
+
+
+def test_upstream_timeout_gets_504_and_error_gets_500(client, scripted, form):
+    try:
+        raise requests.exceptions.ReadTimeout('read timed out')
+    except requests.exceptions.ReadTimeout as e:
+        timeout = CohereError(f'Unexpected exception (ReadTimeout): {e}')
+        timeout.__cause__ = e
+    scripted(lambda prompt: True, timeout)
+    assert client.post('/generate-plan', json=form).status_code == 504
+
+    scripted(lambda prompt: True, CohereError('invalid api token'))
+    response = client.post('/generate-plan', json=form)
+    assert response.status_code == 500
+    assert 'invalid api token' in response.json['error']
+
+
+def test_stream_replays_cached_plan(client, replay, form):
+    streamed = client.post('/generate-plan/stream', json=form)
+    assert streamed.headers['X-Plan-Cache'] == 'miss'
+    events = [line for line in streamed.get_data(as_text=True).splitlines() if line]
+    assert '"type": "done"' in events[-1]
+
+    cached = client.post('/generate-plan/stream', json=form)
+    assert cached.headers['X-Plan-Cache'] == 'hit'
+    assert cached.get_data(as_text=True).splitlines()[-1] == events[-1]
+    assert replay.requests == 1
@@ -0,0 +1,32 @@
+from cohere.error import CohereError
+
+
+def test_degraded_plan_is_served_but_not_cached(client, scripted, form):
+    # Wed is the Lower day of an Upper/Lower/Upper week
+    upstream = scripted(lambda prompt: 'Session: Wed' in prompt, CohereError('upstream unavailable'))
+
+    response = client.post('/generate-plan?mode=per_day&format=json', json=form)
+    assert response.status_code == 200
+    days = {day['day']: day for day in response.json['days']}
+    assert [days[d]['fallback'] for d in ('Mon', 'Wed', 'Fri')] == [False, True, False]
+    # The filled day keeps the split it was planned as and comes from the matching library
+    assert days['Wed']['split'] == 'Lower'
+    assert days['Wed']['exercises'][0]['name'] == 'Bodyweight Squats'
+
+    requests_before = upstream.requests
+    again = client.post('/generate-plan?mode=per_day', json=form)
+    assert again.headers['X-Plan-Cache'] == 'miss'
+    assert upstream.requests > requests_before
+
+
+def test_complete_plan_is_cached(client, replay, form):
+    assert client.post('/generate-plan?mode=per_day', json=form).headers['X-Plan-Cache'] == 'miss'
+    assert client.post('/generate-plan?mode=per_day', json=form).headers['X-Plan-Cache'] == 'hit'
+
+
+def test_no_day_generated_fails(client, scripted, form):
+    scripted(lambda prompt: True, CohereError('upstream unavailable'))
+    assert client.post('/generate-plan?mode=per_day', json=form).status_code == 500
+
+    scripted(lambda prompt: True, TimeoutError('timed out'))
+    assert client.post('/generate-plan?mode=per_day', json=form).status_code == 504
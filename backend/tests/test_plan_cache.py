@@ -0,0 +1,40 @@
+import sqlite3
+import time
+
+from plan_cache import PlanCache
+
+
+def test_shared_tier_serves_other_workers(tmp_path):
+    db_path = str(tmp_path / 'plans.db')
+    PlanCache(db_path=db_path).set('key', {'focus': 'x'})
+
+    other = PlanCache(db_path=db_path)
+    assert other.get('key') == {'focus': 'x'}
+    assert other.stats()['disk_hits'] == 1
+    # Promoted into the worker's own memory tier
+    assert other.get('key') == {'focus': 'x'}
+    assert other.stats()['memory_hits'] == 1
+
+
+def test_expired_entries_miss():
+    cache = PlanCache(ttl=0.01)
+    cache.set('key', {'focus': 'x'})
+    time.sleep(0.02)
+    assert cache.get('key') is None
+    assert cache.stats()['misses'] == 1
+
+
+def test_shared_tier_purges_expired_and_surplus_rows(tmp_path):
+    db_path = str(tmp_path / 'plans.db')
+    cache = PlanCache(ttl=0.01, db_path=db_path, max_rows=5, purge_every=4)
+    for i in range(8):
+        cache.set(f'old-{i}', {'i': i})
+    time.sleep(0.02)
+
+    cache.ttl = 60
+    for i in range(12):
+        cache.set(f'new-{i}', {'i': i})
+
+    rows = sqlite3.connect(db_path).execute('SELECT key FROM plans').fetchall()
+    assert len(rows) == 5
+    assert all(key.startswith('new-') for key, in rows)
@@ -0,0 +1,36 @@
+from plan_parser import PlanStreamParser, parse_exercise, parse_plan, render_exercise
+from planner import finish_plan
+
+
+FORM = {'fitnessLevel': 'beginner', 'goals': 'strength', 'workoutDays': ['Mon', 'Wed']}
+
+
+def test_day_header_without_exercises_is_filled():
+    plan = finish_plan("Mon (Upper):\n- Push-ups: 3 x 10 (Rest 60s)\n\nWed (Lower):\n", dict(FORM))
+    days = {day['day']: day for day in plan['days']}
+    assert days['Mon']['fallback'] is False
+    assert days['Wed']['fallback'] is True
+    assert days['Wed']['split'] == 'Lower'
+    assert days['Wed']['exercises']
+
+
+def test_stream_reports_empty_days_as_missing():
+    parser = PlanStreamParser(['Mon', 'Wed'])
+    parser.feed("Mon (Upper):\n- Push-ups: 3 x 10\nWed (Lower):\n")
+    parser.close()
+    assert parser.missing_days() == ['Wed']
+
+
+def test_unclosed_focus_ends_at_a_day_header():
+    parser = parse_plan("[FOCUS]\nTwo full sessions.\n\nMon (Upper):\n- Push-ups: 3 x 10 (Rest 60s)", ['Mon'])
+    assert parser.focus == 'Two full sessions.'
+    assert parser.missing_days() == []
+
+
+def test_text_after_the_reps_is_kept():
+    exercise = parse_exercise('Push-ups: 3 x 12 per side (Rest 90s)')
+    assert (exercise['sets'], exercise['reps'], exercise['details'], exercise['rest_seconds']) == (3, '12', 'per side', 90)
+    assert render_exercise(exercise) == '- Push-ups: 3 x 12 per side (Rest 90s)'
+
+    assert parse_exercise('Squats: 3x10 + 2 drop sets')['details'] == '+ 2 drop sets'
+    assert parse_exercise('Run: 20 minutes easy')['details'] == '20 minutes easy'
@@ -0,0 +1,102 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def work():
+        calls.append(1)
+        release.wait(5)
+        return 'plan'
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(flight.do('key', work))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    # Let every follower join the leader before it finishes
+    while flight.stats()['coalesced'] < 7:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False] + [True] * 7
+    assert {result for result, _ in results} == {'plan'}
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_followers_receive_the_leaders_error():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('upstream unavailable')
+
+    errors = []
+
+    def call():
+        try:
+            flight.do('key', fail)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flight.stats()['coalesced'] < 1:
+        time.sleep(0.001)
+    release.set()
+    leader.join()
+    follower.join()
+    assert errors == ['upstream unavailable'] * 2
+
+
+def test_running_counts_as_in_flight():
+    flight = SingleFlight()
+    with flight.running():
+        assert flight.stats()['in_flight'] == 1
+    assert flight.stats()['in_flight'] == 0
+
+
+def _generate_once(lock_dir, key, results):
+    flight = SingleFlight(lock_dir=lock_dir, lock_stripes=4)
+    done = os.path.join(lock_dir, f'{key}.done')
+
+    def work():
+        time.sleep(0.3)
+        open(done, 'w').close()
+        return 'generated'
+
+    results.put(flight.do(key, work, recheck=lambda: 'reused' if os.path.exists(done) else None))
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='needs fork')
+def test_processes_share_a_generation_through_lock_stripes(tmp_path):
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [context.Process(target=_generate_once, args=(str(tmp_path), 'key', results)) for _ in range(2)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(10)
+    assert sorted([results.get(timeout=1), results.get(timeout=1)]) == [('generated', False), ('reused', True)]
+
+    flight = SingleFlight(lock_dir=str(tmp_path), lock_stripes=4)
+    for i in range(50):
+        flight.do(f'key-{i}', lambda: None)
+    assert len([name for name in os.listdir(tmp_path) if name.endswith('.lock')]) <= 4
@@ -69,7 +69,7 @@ const Form = () => {
       localStorage.setItem('workoutFormData', JSON.stringify(formData));
       
       console.log('Sending data to backend:', formData);
-      const response = await axios.post('http://localhost:5000/generate-plan', formData, {
+      const response = await axios.post('http://localhost:5000/generate-plan?format=json', formData, {
         timeout: 120000 // 120 second timeout
       });
       console.log('Received response:', response.data);
@@ -20,7 +20,7 @@ const Results = () => {
   };
   
   const parsedWorkoutPlan = useMemo(() => {
-    if (!workoutPlan?.plan) return null;
+    if (!workoutPlan?.plan && !workoutPlan?.days) return null;
     
     // Initialize empty plan for all days
     const dailyPlans = days.reduce((acc, day) => {
@@ -28,6 +28,22 @@ const Results = () => {
       return acc;
     }, {});
     
+    // Structured responses (format=json) already carry parsed days
+    if (Array.isArray(workoutPlan.days)) {
+      workoutPlan.days.forEach(({ day, exercises }) => {
+        if (!dailyPlans[day]) return;
+        dailyPlans[day] = exercises.map(exercise => ({
+          name: exercise.name,
+          sets: exercise.sets,
+          reps: exercise.reps,
+          details: exercise.details,
+          rest: exercise.rest_seconds,
+          explanation: exercise.explanation
+        }));
+      });
+      return dailyPlans;
+    }
+    
     // Parse the plan string and organize by day
     const planLines = workoutPlan.plan.split('\n').map(line => line.trim()).filter(line => line);
     let currentDay = null;
@@ -206,6 +222,13 @@ const Results = () => {
                                     {exercise.sets} sets × {exercise.duration ? 
                                       `${exercise.duration} seconds` : 
                                       `${exercise.reps} reps`}
+                                    {exercise.details && ` ${exercise.details}`}
+                                    {exercise.rest && ` (Rest ${exercise.rest}s)`}
+                                  </p>
+                                )}
+                                {!exercise.sets && exercise.details && (
+                                  <p className="text-xs text-gray-600 mt-1">
+                                    {exercise.details}
                                     {exercise.rest && ` (Rest ${exercise.rest}s)`}
                                   </p>
                                 )}